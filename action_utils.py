@@ -1,15 +1,143 @@
+import functools
 import os
 import platform
+import re
 import string
+import time
+import urllib.parse
 from datetime import datetime
 
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
 from dateutil.parser import parse
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 
 import config
+from metrics_utils import increment
+
+# String types included by BeautifulSoup get_text(), comments and scripts are not
+TEXT_TYPES = (NavigableString, CData)
+# Recent rich text conversions kept, descriptions repeat across work items
+MARKDOWN_CACHE_SIZE = 1024
+
+# Resolves once the DOM has not mutated and no fetch/XHR has been in flight for
+# the quiet period, or with false when the timeout is reached first.
+DOM_IDLE_SCRIPT = """
+const [quietMs, timeoutMs, done] = arguments;
+if (!window.__scraperNetwork) {
+    const network = (window.__scraperNetwork = { pending: 0 });
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        network.pending++;
+        this.addEventListener("loadend", () => network.pending--);
+        return send.apply(this, arguments);
+    };
+    const fetch = window.fetch;
+    window.fetch = function () {
+        network.pending++;
+        return fetch.apply(this, arguments).finally(() => network.pending--);
+    };
+}
+const network = window.__scraperNetwork;
+const start = performance.now();
+let lastMutation = start;
+const observer = new MutationObserver(() => (lastMutation = performance.now()));
+observer.observe(document.body, {
+    childList: true,
+    subtree: true,
+    attributes: true,
+    characterData: true,
+});
+(function check() {
+    const now = performance.now();
+    const idle =
+        now - lastMutation >= quietMs &&
+        network.pending <= 0 &&
+        document.readyState === "complete";
+    if (idle || now - start >= timeoutMs) {
+        observer.disconnect();
+        done(idle);
+        return;
+    }
+    setTimeout(check, Math.min(50, quietMs));
+})();
+"""
+
+# Consecutive misses per (root, selector), used as a circuit breaker
+selector_misses = {}
+
+
+def wait_for_dom_idle(driver, quiet_period=None, timeout=None):
+    quiet_period = config.DOM_QUIET_PERIOD if quiet_period is None else quiet_period
+    timeout = config.DOM_IDLE_TIMEOUT if timeout is None else timeout
+
+    try:
+        return driver.execute_async_script(
+            DOM_IDLE_SCRIPT, quiet_period * 1000, timeout * 1000
+        )
+    except WebDriverException:
+        return False
+
+
+def retry_with_backoff(operation, budget=None, description=None):
+    """
+    Call operation(timeout) until it returns a truthy value or the deadline
+    budget is spent, sleeping with exponential backoff between attempts.
+    """
+    deadline = time.monotonic() + (config.WAIT_BUDGET if budget is None else budget)
+    delay = config.BACKOFF_INITIAL
+
+    while True:
+        remaining = deadline - time.monotonic()
+        timeout = max(min(config.MAX_WAIT_TIME, remaining), 0)
+
+        if result := operation(timeout):
+            return result
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            increment("timeouts")
+            if description:
+                print(f"Gave up waiting for {description}")
+            return None
+
+        increment("retries")
+        if description:
+            print(f"Retrying {description} in {min(delay, remaining):.2f}s")
+
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, config.BACKOFF_MAX)
+
+
+def get_selector_key(root, xpath):
+    # Relative selectors only share misses when searched from the same element
+    if isinstance(root, WebElement):
+        return root.id, xpath
+
+    return root.session_id, xpath
+
+
+def selector_timeout(key, timeout=None):
+    timeout = config.MAX_WAIT_TIME if timeout is None else timeout
+
+    # Selectors which keep missing are only given a short wait
+    if key and selector_misses.get(key, 0) >= config.BREAKER_THRESHOLD:
+        return min(timeout, config.BREAKER_TIMEOUT)
+
+    return timeout
+
+
+def record_selector_result(key, found):
+    if not key:
+        return
+
+    if found:
+        selector_misses.pop(key, None)
+    else:
+        selector_misses[key] = selector_misses.get(key, 0) + 1
 
 
 def click_button_by_id(driver, element_id):
@@ -19,17 +147,19 @@ def click_button_by_id(driver, element_id):
     element.click()
 
 
-def click_button_by_xpath(driver, xpath, retry=0):
-    while retry < config.MAX_RETRIES:
+def click_button_by_xpath(driver, xpath, budget=None):
+    def click(timeout):
         try:
-            element = WebDriverWait(driver, config.MAX_WAIT_TIME).until(
+            element = WebDriverWait(driver, timeout).until(
                 EC.element_to_be_clickable((By.XPATH, xpath))
             )
-            return element.click()
-
         except TimeoutException:
-            print(f"Retrying click button xpath: {xpath}")
-        retry += 1
+            return False
+
+        element.click()
+        return True
+
+    return retry_with_backoff(click, budget, f"click button xpath: {xpath}")
 
 
 def send_keys_by_name(driver, name, keys):
@@ -39,30 +169,40 @@ def send_keys_by_name(driver, name, keys):
     element.send_keys(keys)
 
 
-def find_elements_by_xpath(driver, xpath):
+def find_elements_by_xpath(driver, xpath, timeout=None, breaker=True):
+    # Presence probes, where a miss is an answer, pass breaker=False
+    key = get_selector_key(driver, xpath) if breaker else None
+
     try:
-        e = WebDriverWait(driver, config.MAX_WAIT_TIME).until(
+        e = WebDriverWait(driver, selector_timeout(key, timeout)).until(
             EC.visibility_of_all_elements_located((By.XPATH, xpath))
         )
     except Exception:
+        record_selector_result(key, False)
         return None
 
+    record_selector_result(key, True)
     return e
 
 
-def find_element_by_xpath(driver, xpath):
+def find_element_by_xpath(driver, xpath, timeout=None, breaker=True):
+    # Presence probes, where a miss is an answer, pass breaker=False
+    key = get_selector_key(driver, xpath) if breaker else None
+
     try:
-        e = WebDriverWait(driver, config.MAX_WAIT_TIME).until(
+        e = WebDriverWait(driver, selector_timeout(key, timeout)).until(
             EC.element_to_be_clickable((By.XPATH, xpath))
         )
     except Exception:
+        record_selector_result(key, False)
         return None
 
+    record_selector_result(key, True)
     return e
 
 
-def get_input_value(driver, xpath):
-    if element := find_element_by_xpath(driver, xpath):
+def get_input_value(driver, xpath, timeout=None):
+    if element := find_element_by_xpath(driver, xpath, timeout):
         return element.get_attribute("value")
 
 
@@ -71,31 +211,24 @@ def get_anchor_link(driver, xpath):
         return element.get_attribute("href")
 
 
-def get_text(driver, xpath):
-    if element := find_element_by_xpath(driver, xpath):
-        return element.text
+def get_row_work_item_id(row, default=None):
+    href = get_anchor_link(row, ".//a") or ""
 
+    if match := re.search(r"(\d+)/?$", href.split("?")[0]):
+        return match.group(1)
 
-def add_line_break(word, max_length):
-    if len(word) > max_length:
-        return (
-            word[:max_length]
-            + "\\\n           "
-            + add_line_break(word[max_length:], max_length)
-        )
-    else:
-        return word
+    return default
 
 
-def expand_collapsed_by_xpath(driver):
-    dialog_box = "//div[@role='dialog'][last()]"
-    history_items = "//div[@class='history-item-list']"
-    collapsed_xpath = f"{dialog_box}{history_items}//div[@aria-expanded='false']"
-    collapsed = find_elements_by_xpath(driver, collapsed_xpath)
+def get_text(driver, xpath, timeout=None, breaker=True):
+    if element := find_element_by_xpath(driver, xpath, timeout, breaker):
+        return element.text
+
 
-    if collapsed:
-        for collapse_item in collapsed:
-            collapse_item.click()
+def add_line_break(word, max_length):
+    return "\\\n           ".join(
+        word[start : start + max_length] for start in range(0, len(word), max_length)
+    )
 
 
 def convert_date(
@@ -109,6 +242,54 @@ def convert_date(
     return date_obj.strftime(new_format)
 
 
+def get_discussion_attachment(src, discussion_date):
+    """
+    Return the download URL and file name of an image in a comment, named
+    after the comment date and resource ID, or None when it is no attachment.
+    Shared by the browser and REST sources.
+    """
+    parsed_url = urllib.parse.urlparse(src)
+    query_params = urllib.parse.parse_qs(parsed_url.query)
+    resource_id = parsed_url.path.split("/")[-1]
+
+    file_name = query_params.get("fileName")
+
+    if not file_name:
+        return None
+
+    new_file_name = f"{convert_date(discussion_date)}_{resource_id}_{file_name[0]}"
+    query_params["fileName"] = [new_file_name]
+
+    if "download" not in query_params:
+        query_params["download"] = "True"
+
+    updated_url = urllib.parse.urlunparse(
+        parsed_url._replace(query=urllib.parse.urlencode(query_params, doseq=True))
+    )
+
+    return updated_url, new_file_name
+
+
+def format_description(rich_text, repro_steps_section, resolution_section):
+    """
+    Build the description of a work item from the markdown of its rich text
+    fields by label, ex. "Repro Steps". Shared by the browser and REST sources.
+    """
+    if repro_steps_section:
+        retro = f"* Repro Steps\n** {rich_text['Repro Steps']}\n"
+        system_info = f"* System Info\n** {rich_text['System Info']}\n"
+        acceptance = f"* Acceptance criteria \n** {rich_text['Acceptance Criteria']}\n"
+
+        return retro + system_info + acceptance
+
+    description = f"* Description\n\t* {rich_text['Description']}\n"
+
+    if resolution_section:
+        return description + f"* Repro Steps\n\t* {rich_text['Resolution']}\n"
+
+    return description
+
+
 def create_symlink(source, target):
     if platform.system() == "Windows":
         command = f'mklink /J "{target}" "{source}"'
@@ -141,81 +322,165 @@ def get_roman_numeral(num):
     return result
 
 
-def convert_links(soup):
-    for link in soup.find_all("a"):
-        markdown_link = f"[{link.text}]({link.get('href')})"
-        link.replace_with(markdown_link)
-    return soup
+def get_letters(num):
+    letters = ""
+    while num:
+        num, remainder = divmod(num - 1, 26)
+        letters = string.ascii_lowercase[remainder] + letters
+    return letters
+
+
+def convert_ordered_list(items, state):
+    # state is shared by every ordered list of a conversion, carrying over the
+    # last indentation level and the trailing line break to trim
+    parts = []
+    length = 0
+    index = 0
+    letters = 0
+    roman_numerals = 0
+
+    for indentation_level, (text,) in items:
+        if indentation_level != state["level"]:
+            if state["level"] == 1:
+                state["trim_index"] = length - 1
+                state["trim"] = True
+            state["level"] = indentation_level
+
+        if indentation_level == 0:
+            index += 1
+            line = f"{index}. {text}\n"
+        elif indentation_level == 1:
+            if letters == 0:
+                while parts and parts[-1].endswith("\n"):
+                    part = parts.pop()
+                    length -= len(part)
+                    if stripped := part.rstrip("\n"):
+                        parts.append(stripped)
+                        length += len(stripped)
+                        break
+                parts.append("\\\n")
+                length += 2
+            letters += 1
+            line = f"  {get_letters(letters)}. {text}\\\n"
+        elif indentation_level == 2:
+            if roman_numerals == 0:
+                parts.append("\\\n")
+                length += 2
+            roman_numerals += 1
+            line = f"    {get_roman_numeral(index)}. {text}\\\n"
+        else:
+            continue
+
+        parts.append(line)
+        length += len(line)
+
+    markdown = "".join(parts)
+
+    if state["trim"]:
+        trim_index = state["trim_index"]
+        markdown = markdown[:trim_index].rstrip("\\\n") + markdown[trim_index:]
+
+    return markdown
+
+
+def new_frame(node, parent):
+    frame = dict(parent, node=node, children=iter(node.contents), parts=[])
+    frame.update(kind=None, item=None)
+    context = parent["context"]
+
+    if node.name == "a" and context != "link":
+        frame.update(kind="link", context="link")
+    elif node.name == "ul" and context in ("document", "ol"):
+        frame.update(kind="ul", context="ul", ul_depth=1, ul_items=[])
+    elif node.name == "ol" and context == "document":
+        ol_items = []
+        frame.update(kind="ol", context="ol", ol_depth=1, ol_runs=[ol_items])
+        frame["open_ols"] = ((ol_items, 1),)
+    elif node.name == "ul" and context == "ul":
+        frame["ul_depth"] += 1
+    elif node.name == "ol" and context == "ol":
+        # Nested lists are rendered as part of the outer list, but still
+        # advance the shared ordered list state in document order, with their
+        # own items one level below the list they are nested in
+        ol_items = []
+        frame["ol_runs"].append(ol_items)
+        frame["ol_depth"] += 1
+        frame["open_ols"] = (
+            *frame["open_ols"],
+            (ol_items, max(frame["ol_depth"] - 1, 1)),
+        )
+    elif node.name == "li" and context == "ul":
+        frame["item"] = [None]
+        frame["ul_items"].append((frame["ul_depth"] - 1, frame["item"]))
+    elif node.name == "li" and context == "ol":
+        frame["item"] = [None]
+        for ol_items, base_depth in frame["open_ols"]:
+            ol_items.append((frame["ol_depth"] - base_depth, frame["item"]))
+
+    return frame
+
+
+def finish_frame(frame, ol_state):
+    node = frame["node"]
+    text = "".join(frame["parts"])
+
+    if frame["item"] is not None:
+        frame["item"][0] = text
+
+    if frame["kind"] == "link":
+        text = f"[{text}]({node.get('href')})"
+    elif frame["kind"] == "ul":
+        text = "".join(
+            f"{'  ' * indentation_level}* {item[0]}\n"
+            for indentation_level, item in frame["ul_items"]
+        )
+    elif frame["kind"] == "ol":
+        markdowns = [convert_ordered_list(run, ol_state) for run in frame["ol_runs"]]
+        text = markdowns[0]
+
+    if node.name == "div":
+        text += "\n"
+
+    return text
 
 
 def convert_to_markdown(soup):
-    for div in soup.find_all("div"):
-        div.insert_after("\n")
-
-    for ul in soup.find_all("ul"):
-        markdown_ul = ""
-        for li in ul.find_all("li"):
-            li = convert_links(li)
-            indentation_level = len(li.find_parents("ul")) - 1
-            indentation = "  " * indentation_level
-            markdown_ul += f"{indentation}* {li.text}\n"
-
-        ul.replace_with(markdown_ul)
-
-    prev_indentation_level = None
-    last_occurrence_index = -1
-    last_occurrence_indentation = False
-
-    # Convert ordered lists
-    for ol in soup.find_all("ol"):
-        markdown_ol = ""
-        index = 0
-        letters = 0
-        roman_numerals = 0
-
-        for li in ol.find_all("li"):
-            li = convert_links(li)
-            indentation_level = len(li.find_parents("ol")) - 1
-            indentation = "  " * indentation_level
-
-            if indentation_level != prev_indentation_level:
-                if prev_indentation_level == 1:
-                    last_occurrence_index = len(markdown_ol) - 1
-                    last_occurrence_indentation = True
-                prev_indentation_level = indentation_level
-
-            if indentation_level == 0:
-                index += 1
-                markdown_ol += f"{indentation}{index}. {li.text}\n"
-            elif indentation_level == 1:
-                if letters == 0:
-                    markdown_ol = markdown_ol.rstrip("\n") + "\\\n"
-                letters += 1
-                markdown_ol += (
-                    f"{indentation}{string.ascii_lowercase[letters - 1]}. {li.text}\\\n"
-                )
-
-            elif indentation_level == 2:
-                if roman_numerals == 0:
-                    markdown_ol.rstrip("\n")
-                    markdown_ol += "\\\n"
-                roman_numerals += 1
-                markdown_ol += f"{indentation}{get_roman_numeral(index)}. {li.text}\\\n"
-            else:
-                pass
-
-        if last_occurrence_indentation:
-            markdown_ol = (
-                markdown_ol[:last_occurrence_index].rstrip("\\\n")
-                + markdown_ol[last_occurrence_index:]
-            )
+    """
+    Convert work item HTML to markdown in a single walk of the tree, without
+    modifying it. Divs end with a line break, links become [text](href) and
+    lists are rendered with "* " bullets or numbered, lettered and roman
+    numeral items for the first three ordered list levels.
+    """
+    ol_state = {"level": None, "trim_index": -1, "trim": False}
+    root = {
+        "node": soup,
+        "children": iter(soup.contents),
+        "parts": [],
+        "kind": None,
+        "item": None,
+        "context": "document",
+    }
+    stack = [root]
+
+    while stack:
+        frame = stack[-1]
+        child = next(frame["children"], None)
+
+        if child is None:
+            stack.pop()
+            if stack:
+                stack[-1]["parts"].append(finish_frame(frame, ol_state))
+        elif isinstance(child, Tag):
+            stack.append(new_frame(child, frame))
+        elif type(child) in TEXT_TYPES:
+            frame["parts"].append(child)
 
-        ol.replace_with(markdown_ol)
+    return "".join(root["parts"]).rstrip()
 
-    # Convert links
-    convert_links(soup)
 
-    return soup.get_text().rstrip()
+@functools.lru_cache(maxsize=MARKDOWN_CACHE_SIZE)
+def html_to_markdown(html):
+    return convert_to_markdown(BeautifulSoup(html or "", "html.parser"))
 
 
 def show_more(dialog_box, xpath):
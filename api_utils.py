@@ -0,0 +1,749 @@
+"""
+Azure DevOps REST work item source
+
+Builds the same work item dicts as the Selenium dialog crawler in main.py,
+so post_process_results() can consume either source unchanged.
+"""
+
+import os
+import posixpath
+import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from bs4 import BeautifulSoup
+from dateutil.parser import isoparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import config
+from action_utils import (
+    convert_date,
+    convert_to_markdown,
+    format_description,
+    get_discussion_attachment,
+    html_to_markdown,
+)
+from blob_utils import has_blob
+from checkpoint_utils import is_completed
+from development_utils import get_cached_changeset, get_changeset_key
+from download_utils import download_file
+from fingerprint_utils import get_cached_record, get_fingerprint, store_record
+from jsonl_utils import reset_results
+from logger import logging
+from metrics_utils import increment, span
+from section_utils import collect_sections
+
+BATCH_SIZE = 200
+HTTP_RETRIES = 5
+COMMENTS_API_VERSION = "7.0-preview.3"
+HIERARCHY_FORWARD = "System.LinkTypes.Hierarchy-Forward"
+
+BASIC_FIELDS = {
+    "Task id": "System.Id",
+    "User Name": "System.AssignedTo",
+    "State": "System.State",
+    "Area": "System.AreaPath",
+    "Iteration": "System.IterationPath",
+    "Priority": "Microsoft.VSTS.Common.Priority",
+    "Remaining Work": "Microsoft.VSTS.Scheduling.RemainingWork",
+    "Activity": "Microsoft.VSTS.Common.Activity",
+    "Blocked": "Microsoft.VSTS.CMMI.Blocked",
+    "Effort": "Microsoft.VSTS.Scheduling.Effort",
+    "Severity": "Microsoft.VSTS.Common.Severity",
+}
+
+# Rich text fields by the label the browser source reads them with
+RICH_TEXT_FIELDS = {
+    "Description": "System.Description",
+    "Repro Steps": "Microsoft.VSTS.TCM.ReproSteps",
+    "System Info": "Microsoft.VSTS.TCM.SystemInfo",
+    "Acceptance Criteria": "Microsoft.VSTS.Common.AcceptanceCriteria",
+    "Resolution": "Microsoft.VSTS.Common.Resolution",
+}
+
+# Rich text fields, the only ones holding HTML
+HTML_FIELDS = {
+    "System.Description",
+    "System.History",
+    "Microsoft.VSTS.TCM.ReproSteps",
+    "Microsoft.VSTS.TCM.SystemInfo",
+    "Microsoft.VSTS.Common.AcceptanceCriteria",
+    "Microsoft.VSTS.Common.Resolution",
+}
+
+RELATION_TYPES = {
+    "System.LinkTypes.Hierarchy-Forward": "Child",
+    "System.LinkTypes.Hierarchy-Reverse": "Parent",
+    "System.LinkTypes.Related": "Related",
+    "System.LinkTypes.Dependency-Forward": "Successor",
+    "System.LinkTypes.Dependency-Reverse": "Predecessor",
+    "System.LinkTypes.Duplicate-Forward": "Duplicate",
+    "System.LinkTypes.Duplicate-Reverse": "Duplicate",
+    "Microsoft.VSTS.Common.TestedBy-Forward": "Tested",
+    "Microsoft.VSTS.Common.TestedBy-Reverse": "Tests",
+}
+
+# Bookkeeping fields that change on every revision and are hidden in the UI
+HIDDEN_HISTORY_FIELDS = {
+    "System.Rev",
+    "System.AuthorizedDate",
+    "System.RevisedDate",
+    "System.ChangedDate",
+    "System.ChangedBy",
+    "System.AuthorizedAs",
+    "System.PersonId",
+    "System.Watermark",
+    "System.History",
+}
+
+
+def get_api_base_url(url):
+    if config.API_BASE_URL:
+        return config.API_BASE_URL.rstrip("/")
+
+    scheme, domain, url_path = urllib.parse.urlparse(url)[0:3]
+    url_path = "/".join(url_path.split("/")[1:3])
+    return f"{scheme}://{domain}/{url_path}/_apis"
+
+
+def create_session(token, pool_size=config.API_WORKERS):
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=None,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept"] = "application/json"
+
+    if token:
+        session.auth = ("", token)
+
+    return session
+
+
+def api_request(session, method, url, api_version=None, **kwargs):
+    params = kwargs.pop("params", {})
+    params["api-version"] = api_version or config.API_VERSION
+
+    response = session.request(
+        method, url, params=params, timeout=config.MAX_WAIT_TIME or None, **kwargs
+    )
+    response.raise_for_status()
+    return response
+
+
+def api_get(session, url, api_version=None, **params):
+    return api_request(session, "GET", url, api_version, params=params).json()
+
+
+def api_get_text(session, url, **params):
+    try:
+        response = api_request(
+            session, "GET", url, params=params, headers={"Accept": "text/plain"}
+        )
+    except requests.HTTPError as e:
+        logging.info(f"Unable to fetch {url}: {e}")
+        return None
+
+    return response.text
+
+
+def chunks(items, size):
+    for index in range(0, len(items), size):
+        yield items[index : index + size]
+
+
+def query_work_item_ids(session, base_url, query):
+    response = api_request(
+        session, "POST", f"{base_url}/wit/wiql", json={"query": query}
+    ).json()
+    return [work_item["id"] for work_item in response.get("workItems", [])]
+
+
+def get_work_items(session, base_url, ids, fields=None):
+    work_items = {}
+
+    for batch in chunks(list(ids), BATCH_SIZE):
+        body = {"ids": batch, "errorPolicy": "Omit"}
+
+        if fields:
+            body["fields"] = fields
+        else:
+            body["$expand"] = "All"
+
+        response = api_request(
+            session, "POST", f"{base_url}/wit/workitemsbatch", json=body
+        ).json()
+
+        for work_item in response.get("value", []):
+            if work_item:
+                work_items[work_item["id"]] = work_item
+
+    return work_items
+
+
+def get_field_names(session, base_url):
+    response = api_get(session, f"{base_url}/wit/fields")
+    return {field["referenceName"]: field["name"] for field in response["value"]}
+
+
+def get_relation_id(relation):
+    return int(relation["url"].rstrip("/").split("/")[-1])
+
+
+def get_child_ids(work_item):
+    return [
+        get_relation_id(relation)
+        for relation in work_item.get("relations") or []
+        if relation["rel"] == HIERARCHY_FORWARD
+    ]
+
+
+def get_related_ids(work_item):
+    return [
+        get_relation_id(relation)
+        for relation in work_item.get("relations") or []
+        if relation["rel"] in RELATION_TYPES
+    ]
+
+
+def load_work_item_tree(session, base_url, top_level_ids):
+    work_items = {}
+    pending = list(top_level_ids)
+
+    # Fetch the hierarchy one level at a time so each level is a single batch
+    while pending:
+        work_items.update(get_work_items(session, base_url, pending))
+        pending = [
+            child_id
+            for work_item_id in pending
+            if work_item_id in work_items
+            for child_id in get_child_ids(work_items[work_item_id])
+            if child_id not in work_items
+        ]
+        pending = list(dict.fromkeys(pending))
+
+    return work_items
+
+
+def format_api_date(value, new_format):
+    if not value:
+        return None
+
+    return isoparse(value).astimezone().strftime(new_format)
+
+
+def format_field_value(value, reference=None):
+    if value is None:
+        return None
+
+    if isinstance(value, dict):
+        return value.get("displayName")
+
+    if reference in HTML_FIELDS:
+        return BeautifulSoup(value, "html.parser").get_text()
+
+    return str(value)
+
+
+def get_description(work_item):
+    fields = work_item["fields"]
+    rich_text = {
+        label: html_to_markdown(fields.get(reference))
+        for label, reference in RICH_TEXT_FIELDS.items()
+    }
+
+    return format_description(
+        rich_text,
+        fields.get("System.WorkItemType") == "Bug",
+        "Microsoft.VSTS.Common.Resolution" in fields,
+    )
+
+
+def get_basic_fields(work_item):
+    fields = work_item["fields"]
+    basic_fields = {
+        key: format_field_value(fields.get(reference))
+        for key, reference in BASIC_FIELDS.items()
+    }
+    basic_fields["Task id"] = str(work_item["id"])
+    basic_fields["description"] = get_description(work_item)
+
+    return basic_fields
+
+
+def get_attachments(session, work_item, downloads_directory):
+    results = []
+
+    for relation in work_item.get("relations") or []:
+        if relation["rel"] != "AttachedFile":
+            continue
+
+        attributes = relation.get("attributes", {})
+        updated_at = format_api_date(
+            attributes.get("resourceCreatedDate"), "%Y_%m_%dT%H_%M_%S"
+        )
+        resource_id = relation["url"].rstrip("/").split("/")[-1]
+        new_file_name = f"{updated_at}_{resource_id}_{attributes.get('name')}"
+
+        query = urllib.parse.urlencode({"fileName": new_file_name, "download": True})
+        updated_url = f"{relation['url']}?{query}"
+
+        if not has_blob(updated_url):
+            download_file(
+                session,
+                updated_url,
+                Path(downloads_directory, new_file_name),
+                attributes.get("resourceSize"),
+            )
+        results.append({"url": updated_url, "filename": new_file_name})
+
+    return results
+
+
+def get_discussion_attachment_data(session, attachment, discussion_date, downloads):
+    if not (
+        download := get_discussion_attachment(attachment.get("src"), discussion_date)
+    ):
+        return {}
+
+    updated_url, new_file_name = download
+    if not has_blob(updated_url):
+        download_file(session, updated_url, Path(downloads, new_file_name))
+
+    return {"url": updated_url, "filename": new_file_name}
+
+
+def get_comments(session, base_url, work_item_id):
+    url = f"{base_url}/wit/workItems/{work_item_id}/comments"
+    comments = []
+    params = {}
+
+    while True:
+        response = api_get(session, url, COMMENTS_API_VERSION, **params)
+        comments.extend(response.get("comments", []))
+
+        if not response.get("continuationToken"):
+            return comments
+
+        params["continuationToken"] = response["continuationToken"]
+
+
+def get_discussions(session, base_url, work_item_id, downloads_directory):
+    results = []
+
+    for comment in get_comments(session, base_url, work_item_id):
+        date = format_api_date(comment.get("createdDate"), "%d %B %Y %H:%M:%S")
+        soup = BeautifulSoup(comment.get("text") or "", "html.parser")
+        attachments = soup.find_all("img")
+
+        result = {
+            "User": comment.get("createdBy", {}).get("displayName"),
+            "Content": convert_to_markdown(soup),
+            "Date": date,
+            "attachments": [],
+        }
+
+        for attachment in attachments:
+            attachment_data = get_discussion_attachment_data(
+                session, attachment, date, downloads_directory
+            )
+
+            if attachment_data:
+                result["attachments"].append(attachment_data)
+
+        results.append(result)
+
+    return results
+
+
+def get_related_work(work_item, related_items):
+    related_work_data = {}
+
+    for relation in work_item.get("relations") or []:
+        related_work_type = RELATION_TYPES.get(relation["rel"])
+
+        if not related_work_type:
+            continue
+
+        related_item = related_items.get(get_relation_id(relation))
+
+        if not related_item:
+            continue
+
+        related_fields = related_item["fields"]
+        related_work_item_id = related_item["id"]
+        related_work_title = related_fields.get("System.Title", "").replace(" ", "_")
+        updated_at = format_api_date(
+            related_fields.get("System.ChangedDate"), "%d %B %Y %H:%M:%S"
+        )
+
+        related_work_data.setdefault(related_work_type, []).append(
+            {
+                "filename_source": f"{related_work_item_id}_{related_work_title}",
+                "link_target": f"{related_work_item_id}_{related_work_title}_update_{convert_date(updated_at)}_{related_work_type}",
+                "updated_at": updated_at,
+            }
+        )
+
+    return [
+        {"type": work_item_type, "related_work_items": related_works}
+        for work_item_type, related_works in related_work_data.items()
+    ]
+
+
+def get_updates(session, base_url, work_item_id):
+    url = f"{base_url}/wit/workItems/{work_item_id}/updates"
+    updates = []
+
+    while True:
+        response = api_get(session, url, **{"$top": BATCH_SIZE, "$skip": len(updates)})
+        updates.extend(response.get("value", []))
+
+        if len(response.get("value", [])) < BATCH_SIZE:
+            return updates
+
+
+def get_history(session, base_url, work_item_id, field_names, related_items):
+    results = []
+
+    for update in get_updates(session, base_url, work_item_id):
+        fields = update.get("fields", {})
+        relations = update.get("relations", {})
+        changed_date = fields.get("System.ChangedDate", {}).get("newValue")
+
+        result = {
+            "User": update.get("revisedBy", {}).get("displayName"),
+            "Date": format_api_date(
+                changed_date or update.get("revisedDate"), "%a %d/%m/%Y %H:%M"
+            ),
+            "Title": None,
+            "Links": [],
+            "Fields": [],
+        }
+        titles = []
+
+        for reference, change in fields.items():
+            if reference in HIDDEN_HISTORY_FIELDS:
+                continue
+
+            result["Fields"].append(
+                {
+                    "name": field_names.get(reference, reference),
+                    "old_value": format_field_value(change.get("oldValue"), reference),
+                    "new_value": format_field_value(change.get("newValue"), reference),
+                }
+            )
+
+        if result["Fields"]:
+            names = ", ".join(field["name"] for field in result["Fields"])
+            titles.append(f"Changed {names}")
+
+        if comment := fields.get("System.History", {}).get("newValue"):
+            result["Fields"].append(
+                {
+                    "name": "Comments",
+                    "old_value": None,
+                    "new_value": format_field_value(comment, "System.History"),
+                }
+            )
+            titles.append("Added a comment")
+
+        for action in ("added", "removed"):
+            for relation in relations.get(action, []):
+                related_item = None
+
+                if relation["rel"] in RELATION_TYPES:
+                    related_item = related_items.get(get_relation_id(relation))
+
+                result["Links"].append(
+                    {
+                        "Type": RELATION_TYPES.get(relation["rel"], relation["rel"]),
+                        "Link to item file": relation["url"],
+                        "Title": (
+                            related_item["fields"].get("System.Title")
+                            if related_item
+                            else relation.get("attributes", {}).get("name")
+                        ),
+                    }
+                )
+            if relations.get(action):
+                titles.append(f"{action.capitalize()} link")
+
+        if not titles:
+            continue
+
+        result["Title"] = ", ".join(titles)
+        results.append(result)
+
+    return results
+
+
+def parse_artifact_link(url):
+    # vstfs:///VersionControl/Changeset/123
+    # vstfs:///Git/Commit/<project id>%2F<repository id>%2F<commit id>
+    parts = urllib.parse.unquote(url).split("/")
+
+    if "Changeset" in parts:
+        return "changeset", None, parts[-1]
+
+    if "Commit" in parts:
+        return "commit", parts[-2], parts[-1]
+
+    return None, None, None
+
+
+def get_changeset(session, base_url, changeset_id):
+    changeset_url = f"{base_url}/tfvc/changesets/{changeset_id}"
+    changeset = api_get(session, changeset_url)
+    changes = api_get(session, f"{changeset_url}/changes").get("value", [])
+
+    change_sets = []
+    for change in changes:
+        path = change["item"]["path"]
+        change_sets.append(
+            {
+                "File Name": posixpath.basename(path),
+                "Path": posixpath.dirname(path),
+                "content": api_get_text(
+                    session,
+                    f"{base_url}/tfvc/items",
+                    path=path,
+                    **{
+                        "versionDescriptor.version": changeset_id,
+                        "versionDescriptor.versionType": "changeset",
+                    },
+                ),
+            }
+        )
+
+    return {
+        "ID": changeset_id,
+        "Title": f"Changeset {changeset_id}: {changeset.get('comment', '')}",
+        "change_sets": change_sets,
+    }
+
+
+def get_commit(session, base_url, repository_id, commit_id):
+    repository_url = f"{base_url}/git/repositories/{repository_id}"
+    commit = api_get(session, f"{repository_url}/commits/{commit_id}")
+    changes = api_get(session, f"{repository_url}/commits/{commit_id}/changes")
+
+    change_sets = []
+    for change in changes.get("changes", []):
+        item = change["item"]
+
+        if item.get("gitObjectType") == "tree" or item.get("isFolder"):
+            continue
+
+        change_sets.append(
+            {
+                "File Name": posixpath.basename(item["path"]),
+                "Path": posixpath.dirname(item["path"]),
+                "content": api_get_text(
+                    session,
+                    f"{repository_url}/items",
+                    path=item["path"],
+                    **{
+                        "$format": "text",
+                        "versionDescriptor.version": commit_id,
+                        "versionDescriptor.versionType": "commit",
+                    },
+                ),
+            }
+        )
+
+    return {
+        "ID": commit_id,
+        "Title": commit.get("comment"),
+        "change_sets": change_sets,
+    }
+
+
+def get_development(session, base_url, work_item):
+    results = []
+
+    for relation in work_item.get("relations") or []:
+        if relation["rel"] != "ArtifactLink":
+            continue
+
+        link_type, repository_id, artifact_id = parse_artifact_link(relation["url"])
+
+        try:
+            if link_type == "changeset":
+                results.append(
+                    get_cached_changeset(
+                        get_changeset_key(link_type, artifact_id),
+                        lambda: get_changeset(session, base_url, artifact_id),
+                    )
+                )
+            elif link_type == "commit":
+                results.append(
+                    get_cached_changeset(
+                        get_changeset_key(link_type, artifact_id),
+                        lambda: get_commit(
+                            session, base_url, repository_id, artifact_id
+                        ),
+                    )
+                )
+        except requests.HTTPError as e:
+            logging.info(f"Unable to read development link {relation['url']}: {e}")
+
+    return results
+
+
+def build_work_item_data(
+    session, base_url, work_item, field_names, related_items, downloads_directory
+):
+    work_item_id = work_item["id"]
+    logging.info(f"Fetching work item {work_item_id}")
+
+    fields = work_item["fields"]
+    fingerprint = get_fingerprint(
+        fields.get("System.Rev"), fields.get("System.ChangedDate")
+    )
+
+    work_item_data = get_basic_fields(work_item)
+    work_item_data["Title"] = fields.get("System.Title", "").replace(" ", "_")
+
+    collect_sections(
+        work_item_data,
+        {
+            "discussions": lambda: get_discussions(
+                session, base_url, work_item_id, downloads_directory
+            ),
+            "related_work": lambda: get_related_work(work_item, related_items),
+            "development": lambda: get_development(session, base_url, work_item),
+            "history": lambda: get_history(
+                session, base_url, work_item_id, field_names, related_items
+            ),
+            "attachments": lambda: get_attachments(
+                session, work_item, downloads_directory
+            ),
+        },
+        get_cached_record(work_item_data["Task id"], fingerprint),
+    )
+
+    store_record(work_item_data, fingerprint)
+    increment("work_items")
+
+    return work_item_data
+
+
+def assemble_tree(work_item_ids, work_items_data, work_items, visited=None):
+    visited = set() if visited is None else visited
+    results = []
+
+    for work_item_id in work_item_ids:
+        if work_item_id in visited or work_item_id not in work_items_data:
+            continue
+        visited.add(work_item_id)
+
+        work_item_data = work_items_data[work_item_id]
+        child_ids = get_child_ids(work_items[work_item_id])
+
+        if children := assemble_tree(child_ids, work_items_data, work_items, visited):
+            work_item_data["children"] = children
+
+        results.append(work_item_data)
+
+    return results
+
+
+def get_subtree_ids(work_item_ids, work_items, visited):
+    # Same order and deduplication as assemble_tree
+    subtree_ids = []
+
+    for work_item_id in work_item_ids:
+        if work_item_id in visited or work_item_id not in work_items:
+            continue
+        visited.add(work_item_id)
+
+        subtree_ids.append(work_item_id)
+        subtree_ids += get_subtree_ids(
+            get_child_ids(work_items[work_item_id]), work_items, visited
+        )
+
+    return subtree_ids
+
+
+def api_scraper(url, token, file_path, downloads_directory, save_result, resume=False):
+    base_url = get_api_base_url(url)
+    session = create_session(token)
+    os.makedirs(downloads_directory, exist_ok=True)
+
+    logging.info(f"Querying work items from {base_url}")
+    with span("query"):
+        top_level_ids = query_work_item_ids(session, base_url, config.API_QUERY)
+        work_items = load_work_item_tree(session, base_url, top_level_ids)
+        logging.info(f"Found {len(work_items)} work items")
+
+        related_ids = {i for item in work_items.values() for i in get_related_ids(item)}
+        related_items = dict(work_items)
+        related_items.update(
+            get_work_items(
+                session,
+                base_url,
+                related_ids - set(work_items),
+                fields=["System.Id", "System.Title", "System.ChangedDate"],
+            )
+        )
+        field_names = get_field_names(session, base_url)
+
+    visited = set()
+    trees = [
+        (work_item_id, subtree_ids)
+        for work_item_id in top_level_ids
+        if (subtree_ids := get_subtree_ids([work_item_id], work_items, visited))
+    ]
+    if resume:
+        # Trees saved before the interruption are already in the result file
+        completed = [tree for tree in trees if is_completed(str(tree[0]))]
+        for work_item_id, _ in completed:
+            logging.info(f"Skipping completed work item {work_item_id}")
+
+        trees = [tree for tree in trees if tree not in completed]
+    else:
+        reset_results(file_path)
+
+    def save_tree(work_item_id, futures):
+        work_items_data = {
+            subtree_id: future.result() for subtree_id, future in futures.items()
+        }
+        work_item_data = assemble_tree([work_item_id], work_items_data, work_items)[0]
+        save_result(file_path, str(work_item_id), work_item_data)
+
+    # Each top level tree is appended once built, with a few trees in flight so
+    # workers stay busy without holding the whole board in memory
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=config.API_WORKERS) as executor:
+        for work_item_id, subtree_ids in trees:
+            futures = {
+                subtree_id: executor.submit(
+                    build_work_item_data,
+                    session,
+                    base_url,
+                    work_items[subtree_id],
+                    field_names,
+                    related_items,
+                    downloads_directory,
+                )
+                for subtree_id in subtree_ids
+            }
+            in_flight.append((work_item_id, futures))
+
+            if len(in_flight) >= config.API_WORKERS:
+                save_tree(*in_flight.popleft())
+
+        while in_flight:
+            save_tree(*in_flight.popleft())
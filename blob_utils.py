@@ -0,0 +1,137 @@
+"""
+Content addressed attachment store
+
+Attachments are kept once under data/blobs/<sha256[:2]>/<sha256> and linked
+into every work item folder which references them. An index from Azure
+resource ID to hash is kept across runs so attachments which were already
+stored are not downloaded again.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from urllib.parse import urlparse
+
+import config
+from logger import logging
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CHUNK_SIZE = 64 * 1024
+# Linux ioctl to share extents between files (btrfs, xfs)
+FICLONE = 0x40049409
+
+blob_index = {}
+resource_locks = {}
+lock = threading.Lock()
+
+
+def get_index_path():
+    return Path(config.BLOB_STORE, "index.json")
+
+
+def load_blob_index():
+    if os.path.exists(get_index_path()):
+        with open(get_index_path(), "r", encoding="utf-8") as file:
+            blob_index.update(json.load(file))
+
+
+def save_blob_index():
+    os.makedirs(config.BLOB_STORE, exist_ok=True)
+    temp_path = f"{get_index_path()}.tmp"
+
+    with lock, open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(blob_index, file)
+
+    os.replace(temp_path, get_index_path())
+
+
+def get_resource_id(url):
+    return urlparse(url).path.rstrip("/").split("/")[-1]
+
+
+def get_blob_path(digest):
+    return Path(config.BLOB_STORE, digest[:2], digest)
+
+
+def has_blob(url):
+    digest = blob_index.get(get_resource_id(url))
+    return digest is not None and get_blob_path(digest).exists()
+
+
+def ingest_blob(url, source):
+    digest = hashlib.sha256()
+
+    with open(source, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            digest.update(chunk)
+
+    digest = digest.hexdigest()
+    blob_path = get_blob_path(digest)
+
+    if blob_path.exists():
+        os.remove(source)
+    else:
+        os.makedirs(blob_path.parent, exist_ok=True)
+        shutil.move(source, blob_path)
+
+    with lock:
+        blob_index[get_resource_id(url)] = digest
+
+    return blob_path
+
+
+def reflink(source, destination):
+    if fcntl is None:
+        raise OSError("Reflinks are not supported on this platform")
+
+    with open(source, "rb") as source_file, open(destination, "wb") as file:
+        fcntl.ioctl(file.fileno(), FICLONE, source_file.fileno())
+
+
+def link_blob(blob_path, destination):
+    if os.path.lexists(destination):
+        os.remove(destination)
+
+    try:
+        os.link(blob_path, destination)
+        return
+    except OSError:
+        pass
+
+    try:
+        reflink(blob_path, destination)
+        return
+    except OSError:
+        pass
+
+    shutil.copy2(blob_path, destination)
+
+
+def place_attachment(url, source, destination):
+    # Work items sharing an attachment also share the downloaded source file
+    with lock:
+        resource_lock = resource_locks.setdefault(
+            get_resource_id(url), threading.Lock()
+        )
+
+    with resource_lock:
+        if os.path.exists(source):
+            blob_path = ingest_blob(url, source)
+        elif digest := blob_index.get(get_resource_id(url)):
+            blob_path = get_blob_path(digest)
+        else:
+            logging.info(f"Attachment {destination} was not downloaded")
+            return
+
+    if not blob_path.exists():
+        logging.info(f"Attachment blob {blob_path} is missing")
+        return
+
+    link_blob(blob_path, destination)
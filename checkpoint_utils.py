@@ -0,0 +1,74 @@
+"""
+Checkpoint of an interrupted scrape
+
+Records the top level work items already appended to the result file and,
+for items still in progress, the finished child subtrees. The file is
+rewritten atomically after every change so a crash leaves the last good
+state behind for --resume.
+"""
+
+import json
+import os
+import threading
+
+import config
+from logger import logging
+
+checkpoint = {"completed": [], "in_progress": {}}
+lock = threading.Lock()
+
+
+def load_checkpoint(path=config.CHECKPOINT_FILE):
+    if not os.path.exists(path):
+        logging.info(f"No checkpoint found at {path}, starting from the beginning")
+        return False
+
+    with open(path, "r", encoding="utf-8") as file:
+        checkpoint.update(json.load(file))
+
+    logging.info(
+        f"Resuming after {len(checkpoint['completed'])} completed work items, "
+        f"{len(checkpoint['in_progress'])} in progress"
+    )
+    # The result file is only continued when it holds completed work items
+    return bool(checkpoint["completed"])
+
+
+def save_checkpoint(path=config.CHECKPOINT_FILE):
+    temp_path = f"{path}.tmp"
+
+    with lock:
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(checkpoint, file)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temp_path, path)
+
+
+def remove_checkpoint(path=config.CHECKPOINT_FILE):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def is_completed(key):
+    return key in checkpoint["completed"]
+
+
+def mark_completed(key):
+    with lock:
+        checkpoint["completed"].append(key)
+        checkpoint["in_progress"].pop(key, None)
+
+    save_checkpoint()
+
+
+def get_completed_child(key, child_id):
+    return checkpoint["in_progress"].get(key, {}).get(child_id)
+
+
+def store_completed_child(key, child_id, child_data):
+    with lock:
+        checkpoint["in_progress"].setdefault(key, {})[child_id] = child_data
+
+    save_checkpoint()
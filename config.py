@@ -15,3 +15,39 @@ MAX_RETRIES = int(0 if max1 is None else max1)
 max2 = os.getenv("max_wait_time")
 MAX_WAIT_TIME = int(0 if max2 is None else max2)
 ON_PREM = os.getenv("on_prem", "false").lower() == "true"
+SCRAPE_SOURCE = os.getenv("scrape_source", "browser").lower()
+PERSONAL_ACCESS_TOKEN = os.getenv("personal_access_token")
+API_BASE_URL = os.getenv("api_base_url")
+API_VERSION = os.getenv("api_version", "7.0")
+API_WORKERS = int(os.getenv("api_workers", "8"))
+API_QUERY = os.getenv(
+    "api_query",
+    "SELECT [System.Id] FROM WorkItems WHERE [System.TeamProject] = @project "
+    "AND [System.WorkItemType] = 'Epic' ORDER BY [Microsoft.VSTS.Common.BacklogPriority]",
+)
+WAIT_BUDGET = float(os.getenv("wait_budget", MAX_WAIT_TIME * 3 or 30))
+BACKOFF_INITIAL = float(os.getenv("backoff_initial", "0.25"))
+BACKOFF_MAX = float(os.getenv("backoff_max", "5"))
+BREAKER_THRESHOLD = int(os.getenv("breaker_threshold", "3"))
+BREAKER_TIMEOUT = float(os.getenv("breaker_timeout", "1"))
+DOM_QUIET_PERIOD = float(os.getenv("dom_quiet_period", "0.5"))
+DOM_IDLE_TIMEOUT = float(os.getenv("dom_idle_timeout", "10"))
+FINGERPRINT_FILE = os.getenv("fingerprint_file", "data/fingerprints.json")
+RESULT_FILE = os.getenv("result_file", "data/scrape_result.jsonl")
+CHECKPOINT_FILE = os.getenv("checkpoint_file", "data/checkpoint.json")
+MANIFEST_FILE = os.getenv("manifest_file", "data/manifest.json")
+WRITE_WORKERS = int(os.getenv("write_workers", "8"))
+HTTP_DOWNLOADS = os.getenv("http_downloads", "false").lower() == "true"
+DOWNLOAD_WORKERS = int(os.getenv("download_workers", "4"))
+BLOB_STORE = os.getenv("blob_store", "data/blobs")
+WATCH_DOWNLOADS = os.getenv("watch_downloads", "true").lower() == "true"
+DOWNLOAD_STALL_TIMEOUT = float(os.getenv("download_stall_timeout", "30"))
+BROWSER_PROFILE = os.getenv("browser_profile", "default").lower()
+WINDOW_SIZE = os.getenv("window_size", "1920,1080")
+SESSION_FILE = os.getenv("session_file", "data/session.enc")
+SESSION_KEY = os.getenv("session_key")
+METRICS_FILE = os.getenv("metrics_file", "data/metrics.json")
+PROMETHEUS_FILE = os.getenv("prometheus_file", "data/metrics.prom")
+PROFILE_WEBDRIVER = os.getenv("profile_webdriver", "false").lower() == "true"
+SECTIONS = os.getenv("sections", "all")
+CHANGESET_CACHE_FILE = os.getenv("changeset_cache_file", "")
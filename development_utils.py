@@ -0,0 +1,107 @@
+"""
+Changeset cache and development tab
+
+Changesets and commits are often linked from many work items. Once scraped,
+each one is kept by its link type and ID (ex. changeset/45 or commit/<hash>)
+and later links reuse it. They do not change once made, so with
+CHANGESET_CACHE_FILE set the cache is saved at the end of a run and loaded
+again by the next one. Other development links, ex. pull requests, branches
+and builds, can change and are scraped every time.
+
+Each browser keeps one secondary tab which development links are opened in,
+instead of clicking them into a new window and closing it again.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+import config
+from logger import logging
+from metrics_utils import increment
+
+# Link types whose target never changes, the only ones cached
+CACHED_LINK_TYPES = ["changeset", "commit"]
+
+changesets = {}
+development_tabs = {}
+lock = threading.Lock()
+
+
+def load_changesets(path=None):
+    path = config.CHANGESET_CACHE_FILE if path is None else path
+
+    if not path or not os.path.exists(path):
+        return
+
+    with open(path, "r", encoding="utf-8") as file:
+        # Entries saved under other keys, ex. by older versions, are dropped
+        changesets.update(
+            (key, changeset)
+            for key, changeset in json.load(file).items()
+            if key.split("/")[0] in CACHED_LINK_TYPES
+        )
+
+    logging.info(f"Loaded {len(changesets)} cached changesets from {path}")
+
+
+def save_changesets(path=None):
+    path = config.CHANGESET_CACHE_FILE if path is None else path
+
+    if not path or not changesets:
+        return
+
+    os.makedirs(Path(path).parent, exist_ok=True)
+    temp_path = f"{path}.tmp"
+
+    with lock, open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(changesets, file)
+
+    os.replace(temp_path, path)
+    logging.info(f"Saved {len(changesets)} changesets to {path}")
+
+
+def get_changeset_key(link_type, changeset_id):
+    if link_type in CACHED_LINK_TYPES and changeset_id:
+        return f"{link_type}/{changeset_id}"
+
+    return None
+
+
+def get_cached_changeset(key, scrape):
+    """
+    Return the cached record of key (see get_changeset_key), calling scrape()
+    for it and caching the result on the first request. Links without a key
+    are scraped every time.
+    """
+    if key is None:
+        return scrape()
+
+    if changeset := changesets.get(key):
+        increment("cached_changesets")
+        logging.info(f"Reusing already scraped {key}")
+        return changeset
+
+    if changeset := scrape():
+        with lock:
+            changesets[key] = changeset
+
+    return changeset
+
+
+def open_development_tab(driver):
+    """
+    Switch to the development tab of driver, opening it on first use, and
+    return the handle of the window to switch back to.
+    """
+    original_window = driver.current_window_handle
+    tab = development_tabs.get(driver.session_id)
+
+    if tab not in driver.window_handles:
+        driver.switch_to.new_window("tab")
+        tab = development_tabs[driver.session_id] = driver.current_window_handle
+    else:
+        driver.switch_to.window(tab)
+
+    return original_window
@@ -0,0 +1,242 @@
+"""
+Attachment downloads outside the browser
+
+Copies the Selenium session cookies into a pooled HTTP session and downloads
+attachments on a bounded thread pool while the browser moves on. Partial
+downloads are resumed with Range requests and every file is checked against
+the expected size and checksum before it is renamed into place.
+"""
+
+import base64
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from blob_utils import has_blob
+from logger import logging
+from watcher_utils import expect_download, watch_directory
+
+CHUNK_SIZE = 64 * 1024
+DOWNLOAD_RETRIES = 3
+
+executor = None
+sessions = {}
+download_directories = {}
+pending = []
+destination_locks = {}
+lock = threading.Lock()
+
+
+def register_driver(driver, download_directory):
+    download_directories[driver.session_id] = Path(download_directory)
+
+    if config.WATCH_DOWNLOADS:
+        watch_directory(download_directory)
+
+
+def get_download_directory(driver):
+    return download_directories.get(
+        driver.session_id, Path(os.getcwd(), "data", "attachments")
+    )
+
+
+def create_download_session(pool_size=config.DOWNLOAD_WORKERS):
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    if config.PERSONAL_ACCESS_TOKEN:
+        session.auth = ("", config.PERSONAL_ACCESS_TOKEN)
+    elif config.ON_PREM:
+        session.auth = (config.EMAIL, config.PASSWORD)
+
+    return session
+
+
+def copy_browser_cookies(driver, session):
+    for cookie in driver.get_cookies():
+        session.cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain"),
+            path=cookie.get("path", "/"),
+        )
+
+
+def get_total_size(response):
+    if response.status_code == 206:
+        content_range = response.headers.get("Content-Range", "")
+        total = content_range.rsplit("/", 1)[-1]
+        return int(total) if total.isdigit() else None
+
+    if content_length := response.headers.get("Content-Length"):
+        return int(content_length)
+
+    return None
+
+
+def file_digest(path, algorithm):
+    digest = hashlib.new(algorithm)
+
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            digest.update(chunk)
+
+    return digest
+
+
+def verify_download(path, total_size, content_md5=None, expected_size=None):
+    size = os.path.getsize(path)
+
+    if total_size is not None and size != total_size:
+        logging.info(f"{path}: expected {total_size} bytes, got {size}")
+        return False
+
+    if expected_size is not None and size != int(expected_size):
+        logging.info(f"{path}: expected {expected_size} bytes, got {size}")
+        return False
+
+    if content_md5:
+        checksum = base64.b64encode(file_digest(path, "md5").digest()).decode()
+
+        if checksum != content_md5:
+            logging.info(f"{path}: checksum {checksum} does not match {content_md5}")
+            return False
+
+    return True
+
+
+def download_file(session, url, destination, expected_size=None):
+    destination = Path(destination)
+
+    # The same attachment can be queued by several work items
+    with lock:
+        destination_lock = destination_locks.setdefault(destination, threading.Lock())
+
+    with destination_lock:
+        # Already downloaded, possibly routed to the blob store by the watcher
+        if destination.exists() or has_blob(url):
+            return True
+
+        return fetch_file(session, url, destination, expected_size)
+
+
+def fetch_file(session, url, destination, expected_size=None):
+    part_path = destination.with_name(f"{destination.name}.part")
+
+    for attempt in range(1, DOWNLOAD_RETRIES + 1):
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        headers = {"Accept": "*/*", "Accept-Encoding": "identity"}
+
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+
+        try:
+            with session.get(
+                url,
+                headers=headers,
+                stream=True,
+                timeout=config.MAX_WAIT_TIME or None,
+            ) as response:
+                # The previous attempt already received the whole file
+                if response.status_code == 416:
+                    total_size = offset
+                    content_md5 = None
+                else:
+                    response.raise_for_status()
+                    total_size = get_total_size(response)
+                    content_md5 = response.headers.get("Content-MD5")
+                    mode = "ab" if response.status_code == 206 else "wb"
+
+                    with open(part_path, mode) as file:
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            file.write(chunk)
+        except requests.RequestException as e:
+            logging.info(f"Download {attempt}/{DOWNLOAD_RETRIES} of {url} failed: {e}")
+            continue
+
+        # The connection closed early, resume from the last byte received
+        if total_size is not None and part_path.stat().st_size < total_size:
+            logging.info(f"Download {attempt}/{DOWNLOAD_RETRIES} of {url} incomplete")
+            continue
+
+        if verify_download(part_path, total_size, content_md5, expected_size):
+            os.replace(part_path, destination)
+            logging.info(f"Downloaded {url} to {destination}")
+            return True
+
+        # Corrupt download, start over from the first byte
+        part_path.unlink()
+
+    logging.info(f"Unable to download {url}")
+    return False
+
+
+def queue_download(driver, url, file_name, expected_size=None):
+    global executor
+
+    with lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=config.DOWNLOAD_WORKERS)
+
+        if driver.session_id not in sessions:
+            session = create_download_session()
+            session.headers["User-Agent"] = driver.execute_script(
+                "return navigator.userAgent"
+            )
+            sessions[driver.session_id] = session
+
+    # Refresh cookies so downloads keep working when the browser session renews
+    session = sessions[driver.session_id]
+    copy_browser_cookies(driver, session)
+
+    directory = get_download_directory(driver)
+    os.makedirs(directory, exist_ok=True)
+
+    future = executor.submit(
+        download_file, session, url, Path(directory, file_name), expected_size
+    )
+    pending.append((directory, url, future))
+
+
+def download_attachment(driver, url, file_name):
+    if has_blob(url):
+        logging.info(f"Attachment {file_name} already stored, skipping download")
+        return
+
+    if config.WATCH_DOWNLOADS:
+        expect_download(get_download_directory(driver), url, file_name)
+
+    if config.HTTP_DOWNLOADS:
+        queue_download(driver, url, file_name)
+    else:
+        driver.get(url)
+
+
+def wait_for_downloads(directory=None):
+    failed = []
+
+    for item in list(pending):
+        item_directory, url, future = item
+
+        if directory is not None and item_directory != Path(directory):
+            continue
+
+        if not future.result():
+            failed.append(url)
+
+        with lock:
+            pending.remove(item)
+
+    if failed:
+        logging.info(f"{len(failed)} attachment downloads failed: {failed}")
+
+    return failed
@@ -1,5 +1,6 @@
 import os
 import shutil
+import tempfile
 from pathlib import Path
 from platform import system
 
@@ -7,17 +8,63 @@ from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.chrome.service import Service
 
 import config
+from profiler_utils import profile_driver
 
+# Requests the scraper never reads, blocked in the fast profile. Attachments
+# are served from _apis/wit/attachments and are left alone.
+BLOCKED_URL_PATTERNS = [
+    # Telemetry
+    "*browser.events.data.microsoft.com*",
+    "*dc.services.visualstudio.com*",
+    "*js.monitor.azure.com*",
+    # Fonts
+    "*.woff*",
+    "*.ttf*",
+    "*.eot*",
+    # Avatars
+    "*/_apis/GraphProfile/MemberAvatars/*",
+    "*/_api/_common/identityImage*",
+    # Static images
+    *[
+        f"*{location}*.{extension}*"
+        for location in ("cdn.vsassets.io/", "/_static/")
+        for extension in ("png", "gif", "svg", "jpg")
+    ],
+]
 
-def chrome_settings_init():
+
+def chrome_settings_init(worker_id=None, profile=None):
+    profile = profile or config.BROWSER_PROFILE
     download_directory = Path(os.getcwd(), "data", "attachments")
     language_code = "en-GB"
 
+    # Parallel workers get their own browser profile and download directory
+    if worker_id is not None:
+        download_directory = Path(download_directory, f"worker_{worker_id}")
+        profile_directory = Path(
+            tempfile.gettempdir(), "azure-scraper", f"worker_{worker_id}"
+        )
+        shutil.rmtree(profile_directory, ignore_errors=True)
+        os.makedirs(profile_directory)
+
     chrome_options = ChromeOptions()
     # chrome_options.add_argument("--headless=new")
     chrome_options.accept_insecure_certs = True
-    chrome_options.add_argument("--start-maximized")
     chrome_options.add_argument("--incognito")
+
+    if profile == "fast":
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--disable-extensions")
+        # The backlog grid is virtualised, only rows inside the window render
+        chrome_options.add_argument(f"--window-size={config.WINDOW_SIZE}")
+        chrome_options.page_load_strategy = "eager"
+    else:
+        chrome_options.add_argument("--start-maximized")
+
+    if worker_id is not None:
+        chrome_options.add_argument(f"--user-data-dir={profile_directory}")
+
     chrome_options.add_experimental_option(
         "prefs",
         {
@@ -43,3 +90,19 @@ def chrome_settings_init():
         os.makedirs(download_directory)
 
     return chrome_settings, download_directory
+
+
+def configure_driver(driver, download_directory, profile=None):
+    if config.PROFILE_WEBDRIVER:
+        profile_driver(driver)
+
+    if (profile or config.BROWSER_PROFILE) != "fast":
+        return
+
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    # Headless Chrome only saves downloads when explicitly allowed
+    driver.execute_cdp_cmd(
+        "Browser.setDownloadBehavior",
+        {"behavior": "allow", "downloadPath": str(download_directory)},
+    )
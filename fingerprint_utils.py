@@ -0,0 +1,108 @@
+"""
+Per work item fingerprint cache for incremental scrapes
+
+Each scraped work item is stored with its revision and changed date. When a
+later run finds the same fingerprint, the previously scraped sections are
+reused instead of opening the history, discussion, development and
+attachment tabs again.
+"""
+
+import json
+import os
+import re
+import threading
+
+import config
+from logger import logging
+
+# A year and a time of day, ex. 14/03/2023 10:42 or 2023-03-14T10:42:00Z
+ABSOLUTE_DATE_PATTERN = re.compile(
+    r"\b\d{4}\b.*\b\d{1,2}:\d{2}|\b\d{1,2}:\d{2}\b.*\b\d{4}\b"
+)
+
+fingerprints = {}
+lock = threading.Lock()
+
+
+def load_fingerprints(path=config.FINGERPRINT_FILE):
+    if not os.path.exists(path):
+        logging.info(f"No fingerprint cache found at {path}")
+        return
+
+    with open(path, "r", encoding="utf-8") as file:
+        fingerprints.update(json.load(file))
+
+    logging.info(f"Loaded {len(fingerprints)} fingerprints from {path}")
+
+
+def save_fingerprints(path=config.FINGERPRINT_FILE):
+    temp_path = f"{path}.tmp"
+
+    with lock, open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(fingerprints, file)
+
+    os.replace(temp_path, path)
+
+
+def get_fingerprint(rev, changed_date):
+    # Relative dates (ex. "3 days ago") change without the work item changing
+    # and can stay the same when it does, so those items are always scraped
+    if not changed_date or not ABSOLUTE_DATE_PATTERN.search(changed_date):
+        return None
+
+    return [rev, changed_date]
+
+
+def get_cached_record(task_id, fingerprint):
+    if fingerprint is None:
+        return None
+
+    cached = fingerprints.get(str(task_id))
+
+    if cached and cached["fingerprint"] == fingerprint:
+        logging.info(f"Work item {task_id} unchanged, reusing cached sections")
+        return cached["record"]
+
+    return None
+
+
+def get_previous_record(task_id):
+    # The last scraped record, whether or not the work item changed since
+    if cached := fingerprints.get(str(task_id)):
+        return cached["record"]
+
+    return None
+
+
+def get_history_revision(task_id):
+    # The revision the stored history was read up to, older caches only have
+    # the entries, one per revision unless some could not be read
+    if cached := fingerprints.get(str(task_id)):
+        history = cached["record"].get("history") or []
+        return cached.get("history_revision", len(history)) if history else 0
+
+    return 0
+
+
+def store_record(record, fingerprint, history_revision=None):
+    if fingerprint is None:
+        return
+
+    task_id = str(record["Task id"])
+
+    with lock:
+        # History reused from the cache was read up to the same revision
+        if history_revision is None and (previous := fingerprints.get(task_id)):
+            history_revision = previous.get("history_revision")
+
+        fingerprints[task_id] = {
+            "fingerprint": fingerprint,
+            "record": {
+                key: value
+                for key, value in record.items()
+                if key not in ("children", "cached")
+            },
+        }
+
+        if history_revision is not None and record.get("history") is not None:
+            fingerprints[task_id]["history_revision"] = history_revision
@@ -0,0 +1,66 @@
+"""
+Streaming JSON lines storage for scrape results
+
+Each top level work item tree is appended as one line as soon as it is
+scraped, so a crash only loses the item in progress. Files ending in .gz are
+gzip compressed and files ending in .zst are zstd compressed (requires the
+optional zstandard package). Compressed appends are written as separate
+members/frames which readers transparently concatenate.
+"""
+
+import gzip
+import io
+import json
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def check_compression(path):
+    if str(path).endswith(".zst") and zstandard is None:
+        raise RuntimeError("Install the zstandard package to use .zst result files")
+
+
+def reset_results(path):
+    check_compression(path)
+
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def append_result(path, record):
+    line = json.dumps(record) + "\n"
+
+    if str(path).endswith(".gz"):
+        with gzip.open(path, "at", encoding="utf-8") as file:
+            file.write(line)
+    elif str(path).endswith(".zst"):
+        with open(path, "ab") as file:
+            file.write(zstandard.ZstdCompressor().compress(line.encode("utf-8")))
+    else:
+        with open(path, "a", encoding="utf-8") as file:
+            file.write(line)
+
+
+def open_results(path):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+
+    if str(path).endswith(".zst"):
+        check_compression(path)
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            open(path, "rb"), read_across_frames=True, closefd=True
+        )
+        return io.TextIOWrapper(reader, encoding="utf-8")
+
+    return open(path, "r", encoding="utf-8")
+
+
+def read_results(path):
+    with open_results(path) as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
@@ -1,5 +1,10 @@
-import json
-import time
+import argparse
+import itertools
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from urllib.parse import urlparse
 
 from selenium import webdriver
@@ -11,19 +16,55 @@ from action_utils import (
     find_element_by_xpath,
     find_elements_by_xpath,
     get_input_value,
+    get_row_work_item_id,
+    retry_with_backoff,
     send_keys_by_name,
+    wait_for_dom_idle,
 )
-from driver_utils import chrome_settings_init
+from api_utils import api_scraper
+from blob_utils import load_blob_index
+from checkpoint_utils import (
+    get_completed_child,
+    is_completed,
+    load_checkpoint,
+    mark_completed,
+    remove_checkpoint,
+    store_completed_child,
+)
+from development_utils import load_changesets, save_changesets
+from download_utils import register_driver, wait_for_downloads
+from driver_utils import chrome_settings_init, configure_driver
+from fingerprint_utils import (
+    get_cached_record,
+    get_fingerprint,
+    get_history_revision,
+    get_previous_record,
+    load_fingerprints,
+    save_fingerprints,
+    store_record,
+)
+from jsonl_utils import append_result, reset_results
 from logger import logging
+from memo_utils import get_memoized, memoize, report_cache_hits
+from metrics_utils import increment, save_metrics, span
+from profiler_utils import report_profile
+from replay_utils import record_driver
 from results_processor import post_process_results
 from scrape_utils import (
+    parse_basic_fields,
     scrape_attachments,
-    scrape_basic_fields,
     scrape_development,
     scrape_discussions,
     scrape_history,
     scrape_related_work,
+    snapshot_dialog_fields,
 )
+from section_utils import SECTIONS, collect_sections, get_sections
+from session_utils import restore_session, save_session
+from watcher_utils import wait_for_routing
+
+TOP_LEVEL_XPATH = '//div[@aria-level="1"]'
+login_lock = threading.Lock()
 
 
 def login(driver, url, email, password):
@@ -34,44 +75,72 @@ def login(driver, url, email, password):
         driver.get(url)
         return
 
-    driver.get(url)
-    send_keys_by_name(driver, "loginfmt", email)
-    click_button_by_id(driver, "idSIButton9")
-    send_keys_by_name(driver, "passwd", password)
-    click_button_by_id(driver, "idSIButton9")
-    click_button_by_id(driver, "idSIButton9")
+    # Workers log in one at a time so the others can reuse the saved session
+    with login_lock:
+        if restore_session(driver, url):
+            return
+
+        driver.get(url)
+        send_keys_by_name(driver, "loginfmt", email)
+        click_button_by_id(driver, "idSIButton9")
+        send_keys_by_name(driver, "passwd", password)
+        click_button_by_id(driver, "idSIButton9")
+        click_button_by_id(driver, "idSIButton9")
+        save_session(driver, url)
+
 
+def scrape_new_history(driver, task_id, revisions):
+    # Changed work items only read the revisions added since the last scrape
+    previous = (get_previous_record(task_id) or {}).get("history") or []
+    history, revisions["history"] = scrape_history(
+        driver, since_rev=get_history_revision(task_id)
+    )
 
-def scrape_child_work_items(driver):
+    return None if history is None else history + previous
+
+
+def scrape_child_work_items(driver, checkpoint_key=None):
     dialog_xpath = "//div[@role='dialog'][last()]"
     title_xpath = f"{dialog_xpath}//input[@aria-label='Title Field']"
     close_xpath = ".//button[contains(@class, 'ui-button')]"
 
-    retry = 0
-    title = None
-    dialog_box = None
+    with span("dialog_open"):
+        title = retry_with_backoff(
+            lambda timeout: get_input_value(driver, title_xpath, timeout),
+            description="finding of dialog box",
+        )
 
-    while retry < config.MAX_RETRIES:
-        title = get_input_value(driver, title_xpath)
+    if not title:
+        print("Error: Unable to find dialog box!!")
+        return
 
-        if title:
-            print("Open dialog box for ", title)
-            dialog_box = find_element_by_xpath(driver, dialog_xpath)
-            break
+    print("Open dialog box for ", title)
+    dialog_box = find_element_by_xpath(driver, dialog_xpath)
 
-        if retry == config.MAX_RETRIES:
-            print("Error: Unable to find dialog box!!")
-            return
-        retry += 1
-        print(f"Retrying finding of dialog box ... {retry}/{config.MAX_RETRIES}")
+    with span("basic_fields"):
+        snapshot = snapshot_dialog_fields(dialog_box)
+        fingerprint = get_fingerprint(None, snapshot["changed_date"])
+        work_item_data = parse_basic_fields(snapshot)
 
-    work_item_data = scrape_basic_fields(dialog_box)
     work_item_data["Title"] = title.replace(" ", "_")
-    work_item_data["discussions"] = scrape_discussions(driver)
-    work_item_data["related_work"] = scrape_related_work(driver, dialog_box)
-    work_item_data["development"] = scrape_development(driver)
-    work_item_data["history"] = scrape_history(driver)
-    work_item_data["attachments"] = scrape_attachments(driver)
+    revisions = {}
+
+    collect_sections(
+        work_item_data,
+        {
+            "discussions": lambda: scrape_discussions(driver),
+            "related_work": lambda: scrape_related_work(driver, dialog_box),
+            "development": lambda: scrape_development(driver),
+            "history": lambda: scrape_new_history(
+                driver, work_item_data["Task id"], revisions
+            ),
+            "attachments": lambda: scrape_attachments(driver),
+        },
+        get_cached_record(work_item_data["Task id"], fingerprint),
+    )
+
+    store_record(work_item_data, fingerprint, revisions.get("history"))
+    increment("work_items")
 
     for key, value in work_item_data.items():
         print(key, ":", value)
@@ -83,65 +152,300 @@ def scrape_child_work_items(driver):
     if child_work_items:
         children = []
         for work_item in child_work_items:
+            child_id = get_row_work_item_id(work_item)
+
+            child_data = get_completed_child(checkpoint_key, child_id)
+            child_data = child_data or get_memoized(child_id)
+
+            if child_data:
+                print(f"Reusing already scraped child work item {child_id}")
+                children.append(child_data)
+                continue
+
             click_button_by_xpath(work_item, ".//a")
 
             child_data = scrape_child_work_items(driver)
             children.append(child_data)
 
+            if checkpoint_key and child_id:
+                store_completed_child(checkpoint_key, child_id, child_data)
+
         work_item_data["children"] = children
 
     click_button_by_xpath(dialog_box, close_xpath)
+    memoize(work_item_data)
 
     return work_item_data
 
 
-def scraper(driver, url, email, password, file_path):
+def get_top_level_work_items(driver):
+    return find_elements_by_xpath(driver, TOP_LEVEL_XPATH) or []
+
+
+def scrape_top_level_work_item(driver, index):
+    work_items = find_elements_by_xpath(driver, TOP_LEVEL_XPATH)
+    work_item = work_items[index]
+    checkpoint_key = get_row_work_item_id(work_item, default=str(index))
+
+    if is_completed(checkpoint_key):
+        logging.info(f"Skipping completed work item {checkpoint_key}")
+        return checkpoint_key, None
+
+    if work_item_data := get_memoized(checkpoint_key):
+        return checkpoint_key, work_item_data
+
+    with span("work_item"):
+        logging.info("Waiting for backlog to settle...")
+        with span("backlog_idle"):
+            wait_for_dom_idle(driver)
+
+        # Open Dialog Box
+        click_button_by_xpath(work_item, ".//a")
+
+        # Scrape Child Items
+        return checkpoint_key, scrape_child_work_items(driver, checkpoint_key)
+
+
+def save_result(file_path, checkpoint_key, work_item_data):
+    if work_item_data is None:
+        return
+
+    logging.info(f"Saving result to {file_path}")
+    append_result(file_path, work_item_data)
+    mark_completed(checkpoint_key)
+    save_fingerprints()
+
+
+def scraper(driver, url, email, password, file_path, resume=False):
     logging.info(f"Navigate and login to {url}")
-    login(driver, url, email, password)
+    with span("login"):
+        login(driver, url, email, password)
     logging.info("Done")
 
     # Find each work item
-    work_items = find_elements_by_xpath(driver, '//div[@aria-level="1"]')
-    work_items_count = len(work_items)
+    work_items_count = len(get_top_level_work_items(driver))
     work_items_ctr = 0
 
-    result_set = []
+    if not resume:
+        reset_results(file_path)
+
     while work_items_ctr < work_items_count:
-        work_items = find_elements_by_xpath(driver, '//div[@aria-level="1"]')
-        work_item = work_items[work_items_ctr]
+        save_result(file_path, *scrape_top_level_work_item(driver, work_items_ctr))
 
-        logging.info("Sleeping...")
-        time.sleep(5)
+        work_items_ctr += 1
 
-        # Open Dialog Box
-        click_button_by_xpath(work_item, ".//a")
 
-        # Scrape Child Items
-        work_item_data = scrape_child_work_items(driver)
-        result_set.append(work_item_data)
+def scrape_worker(worker_id, url, email, password, next_index, store_result):
+    chrome_config, download_directory = chrome_settings_init(worker_id)
 
-        work_items_ctr += 1
+    with webdriver.Chrome(**chrome_config) as driver:
+        configure_driver(driver, download_directory)
+        register_driver(driver, download_directory)
+
+        logging.info(f"Worker {worker_id}: navigate and login to {url}")
+        with span("login"):
+            login(driver, url, email, password)
+        work_items_count = len(get_top_level_work_items(driver))
+
+        while (index := next_index()) < work_items_count:
+            logging.info(f"Worker {worker_id}: scraping work item {index}")
+            store_result(index, scrape_top_level_work_item(driver, index))
+
+        # Browser downloads are cancelled once the driver quits
+        with span("wait_for_downloads"):
+            wait_for_downloads(download_directory)
+            wait_for_routing(download_directory)
+
+    return download_directory
+
+
+def parallel_scraper(
+    url, email, password, file_path, downloads_directory, workers, resume=False
+):
+    pending = {}
+    next_write = 0
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def next_index():
+        with lock:
+            return next(counter)
+
+    def write_result(index):
+        save_result(file_path, *pending.pop(index))
+
+    # Keep backlog order by only appending once every earlier item is written
+    def store_result(index, result):
+        nonlocal next_write
+
+        with lock:
+            pending[index] = result
+
+            while next_write in pending:
+                write_result(next_write)
+                next_write += 1
+
+    if not resume:
+        reset_results(file_path)
+
+    failed = False
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                scrape_worker, worker_id, url, email, password, next_index, store_result
+            )
+            for worker_id in range(workers)
+        ]
+
+        for worker_id, future in enumerate(futures):
+            try:
+                worker_downloads = future.result()
+            except Exception as e:
+                logging.exception(f"Worker {worker_id} failed: {e}")
+                failed = True
+                continue
+
+            # Merge worker downloads back for post processing, workers which
+            # never downloaded anything have no directory
+            if worker_downloads.is_dir():
+                for file in worker_downloads.iterdir():
+                    shutil.move(file, Path(downloads_directory, file.name))
+                shutil.rmtree(worker_downloads)
+
+    # Work items after one a failed worker did not finish are left for
+    # --resume, appending them now would break backlog order
+    if pending:
+        logging.info(
+            f"Work item {next_write} was not scraped, {len(pending)} later work "
+            "items are scraped again with --resume"
+        )
 
-    logging.info(f"Saving result to {file_path}")
-    with open(file_path, "w", encoding="utf-8") as outfile:
-        json.dump(result_set, outfile)
+    if failed:
+        raise RuntimeError("Scrape incomplete, run again with --resume to continue")
 
 
 def main():
-    save_file = "data/scrape_result.json"
+    parser = argparse.ArgumentParser(description="Scrape Azure DevOps work items.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of parallel browser sessions to shard top level work items",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reuse previously scraped sections of work items which have not changed",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted scrape from the last checkpoint",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        help="Save the WebDriver commands of the scrape for python -m scripts.replay",
+    )
+    parser.add_argument(
+        "--sections",
+        help="Comma separated sections to scrape and export: "
+        f"{', '.join(SECTIONS)}, all or none (defaults to SECTIONS)",
+    )
+    args = parser.parse_args()
+
+    if args.sections is not None:
+        config.SECTIONS = args.sections
+
+    try:
+        sections = get_sections()
+    except ValueError as e:
+        parser.error(str(e))
+
+    logging.info(f"Scraping sections: {', '.join(sections) or 'none'}")
+
+    if args.record:
+        if (
+            config.SCRAPE_SOURCE == "api"
+            or args.workers > 1
+            or args.incremental
+            or args.resume
+        ):
+            parser.error("--record needs a full scrape with a single browser")
+
+        # Keep every request inside the browser so the recording covers it
+        config.HTTP_DOWNLOADS = False
+        config.SESSION_FILE = ""
+        config.CHANGESET_CACHE_FILE = ""
+
+    save_file = config.RESULT_FILE
     chrome_config, chrome_downloads = chrome_settings_init()
 
-    with webdriver.Chrome(**chrome_config) as driver:
-        scraper(
-            driver,
+    load_blob_index()
+    load_changesets()
+
+    if args.incremental or args.resume:
+        load_fingerprints()
+
+    # Without a checkpoint the result file holds no part of this scrape
+    resume = False
+    if args.resume:
+        resume = load_checkpoint()
+    else:
+        remove_checkpoint()
+
+    if config.SCRAPE_SOURCE == "api":
+        api_scraper(
+            config.BASE_URL,
+            config.PERSONAL_ACCESS_TOKEN,
+            save_file,
+            chrome_downloads,
+            save_result,
+            resume,
+        )
+    elif args.workers > 1:
+        os.makedirs(chrome_downloads, exist_ok=True)
+        parallel_scraper(
             config.BASE_URL,
             config.EMAIL,
             config.PASSWORD,
             save_file,
+            chrome_downloads,
+            args.workers,
+            resume,
         )
-
-    post_process_results(save_file, chrome_downloads)
+    else:
+        with webdriver.Chrome(**chrome_config) as driver:
+            configure_driver(driver, chrome_downloads)
+            if args.record:
+                record_driver(driver, args.record)
+            register_driver(driver, chrome_downloads)
+            scraper(
+                driver,
+                config.BASE_URL,
+                config.EMAIL,
+                config.PASSWORD,
+                save_file,
+                resume,
+            )
+            with span("wait_for_downloads"):
+                wait_for_downloads()
+                wait_for_routing()
+
+    # The REST source reads each work item once, the cache is browser only
+    if config.SCRAPE_SOURCE != "api":
+        report_cache_hits()
+    remove_checkpoint()
+    save_fingerprints()
+    save_changesets()
+    with span("post_process"):
+        post_process_results(save_file, chrome_downloads, incremental=args.incremental)
 
 
 if __name__ == "__main__":
-    main()
+    # Metrics are written for failed runs too, to see where they got stuck
+    try:
+        main()
+    finally:
+        save_metrics()
+        report_profile()
@@ -0,0 +1,41 @@
+"""
+In-run cache of scraped work items
+
+A work item can be reached from several parents. Once scraped, its record
+(including its children) is kept by Task id so later encounters reuse it
+instead of opening the dialog again.
+"""
+
+import threading
+
+from logger import logging
+
+scraped_work_items = {}
+cache_hits = 0
+lock = threading.Lock()
+
+
+def get_memoized(task_id):
+    global cache_hits
+
+    if task_id is None or (work_item_data := scraped_work_items.get(task_id)) is None:
+        return None
+
+    with lock:
+        cache_hits += 1
+
+    logging.info(f"Reusing already scraped work item {task_id}")
+    return work_item_data
+
+
+def memoize(work_item_data):
+    if work_item_data and work_item_data.get("Task id"):
+        scraped_work_items[str(work_item_data["Task id"])] = work_item_data
+
+
+def report_cache_hits():
+    message = (
+        f"Work item cache: {cache_hits} hits, {len(scraped_work_items)} items scraped"
+    )
+    print(message)
+    logging.info(message)
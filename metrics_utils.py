@@ -0,0 +1,136 @@
+"""
+Run metrics
+
+Timing spans nest per thread, so a span opened inside another is recorded
+under its parent's path (ex. work_item/discussions), and the count, total and
+slowest time of each path are kept. Counters track retries, timeouts and
+scraped work items. Both are written at the end of the run as a JSON summary
+(METRICS_FILE) and in the Prometheus text format (PROMETHEUS_FILE).
+"""
+
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import config
+from logger import logging
+
+spans = {}
+counters = {}
+lock = threading.Lock()
+local = threading.local()
+started = time.perf_counter()
+started_at = datetime.now(timezone.utc)
+
+
+@contextlib.contextmanager
+def span(name):
+    stack = local.__dict__.setdefault("stack", [])
+    stack.append(name)
+    path = "/".join(stack)
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+
+        with lock:
+            timing = spans.setdefault(path, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+            timing["count"] += 1
+            timing["total_s"] += elapsed
+            timing["max_s"] = max(timing["max_s"], elapsed)
+
+
+def increment(name, amount=1):
+    with lock:
+        counters[name] = counters.get(name, 0) + amount
+
+
+def get_summary():
+    duration = time.perf_counter() - started
+
+    with lock:
+        work_items = counters.get("work_items", 0)
+        return {
+            "started": started_at.isoformat(),
+            "duration_s": duration,
+            "work_items_per_minute": work_items / duration * 60 if duration else 0,
+            "counters": dict(counters),
+            "spans": {path: dict(timing) for path, timing in sorted(spans.items())},
+        }
+
+
+def get_metric_name(name):
+    return "scraper_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_prometheus(summary):
+    lines = [
+        "# HELP scraper_run_duration_seconds Seconds since the run started",
+        "# TYPE scraper_run_duration_seconds gauge",
+        f"scraper_run_duration_seconds {summary['duration_s']:.6f}",
+        "# HELP scraper_work_items_per_minute Work items scraped per minute",
+        "# TYPE scraper_work_items_per_minute gauge",
+        f"scraper_work_items_per_minute {summary['work_items_per_minute']:.6f}",
+    ]
+
+    for name, value in sorted(summary["counters"].items()):
+        metric = f"{get_metric_name(name)}_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+
+    span_metrics = [
+        ("scraper_span_seconds_total", "counter", "total_s", "Seconds spent in span"),
+        ("scraper_span_count_total", "counter", "count", "Times the span was entered"),
+        ("scraper_span_max_seconds", "gauge", "max_s", "Slowest single span"),
+    ]
+    for metric, metric_type, key, description in span_metrics:
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} {metric_type}"]
+        for path, timing in summary["spans"].items():
+            lines.append(f'{metric}{{span="{escape_label(path)}"}} {timing[key]}')
+
+    return "\n".join(lines) + "\n"
+
+
+def save_metrics(json_file=None, prometheus_file=None):
+    json_file = config.METRICS_FILE if json_file is None else json_file
+    prometheus_file = (
+        config.PROMETHEUS_FILE if prometheus_file is None else prometheus_file
+    )
+    # Nothing ran, ex. argument errors
+    if not spans and not counters:
+        return None
+
+    summary = get_summary()
+
+    for file_path, content in [
+        (json_file, lambda: json.dumps(summary, indent=2)),
+        (prometheus_file, lambda: format_prometheus(summary)),
+    ]:
+        if not file_path:
+            continue
+
+        os.makedirs(Path(file_path).parent, exist_ok=True)
+        Path(file_path).write_text(content())
+        logging.info(f"Saved run metrics to {file_path}")
+
+    message = (
+        f"Run metrics: {summary['counters'].get('work_items', 0)} work items "
+        f"({summary['work_items_per_minute']:.1f}/min), "
+        f"{summary['counters'].get('retries', 0)} retries, "
+        f"{summary['counters'].get('timeouts', 0)} timeouts"
+    )
+    print(message)
+    logging.info(message)
+
+    return summary
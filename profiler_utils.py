@@ -0,0 +1,142 @@
+"""
+WebDriver command profiler
+
+When PROFILE_WEBDRIVER is enabled, the execute method of each driver is
+wrapped so every WebDriver command, including the ones sent by its
+WebElements, is counted and timed by command, by calling function and by
+selector. Elements remember the selector they were found with, so later
+get_attribute or click commands on them are charged to that selector. The
+ranked report printed at the end of the run divides the totals by the
+number of scraped work items.
+"""
+
+import re
+import sys
+import threading
+import time
+
+from selenium.webdriver.remote.webelement import WebElement
+
+from logger import logging
+from metrics_utils import counters
+
+# Helpers whose callers are more telling than the helper itself
+SKIPPED_MODULES = {__name__, "action_utils"}
+REPORT_SIZE = 15
+# Atoms selenium runs as scripts, ex. get_attribute and is_displayed
+ATOM_PATTERN = re.compile(r"^/\* (\w+) \*/")
+
+profiles = {"command": {}, "caller": {}, "selector": {}}
+element_selectors = {}
+lock = threading.Lock()
+
+
+def get_caller():
+    frame = sys._getframe(2)
+
+    while frame:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith("selenium") and module not in SKIPPED_MODULES:
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+
+    return "unknown"
+
+
+def get_command(driver_command, params):
+    if match := ATOM_PATTERN.match(params.get("script", "")):
+        return match.group(1)
+
+    return driver_command
+
+
+def get_selector(params):
+    if "using" in params and "value" in params:
+        return f"{params['using']}={params['value']}"
+
+    # Scripts are charged to the first element passed to them
+    for argument in params.get("args", []):
+        if isinstance(argument, WebElement):
+            return element_selectors.get(argument.id)
+
+    return element_selectors.get(params.get("id"))
+
+
+def remember_elements(value, selector):
+    elements = value if isinstance(value, list) else [value]
+
+    for element in elements:
+        if isinstance(element, WebElement):
+            element_selectors[element.id] = selector
+
+
+def record(key, name, elapsed):
+    timing = profiles[key].setdefault(name, {"count": 0, "total_s": 0.0})
+    timing["count"] += 1
+    timing["total_s"] += elapsed
+
+
+def profile_driver(driver):
+    execute = driver.execute
+
+    def profiled_execute(driver_command, params=None):
+        caller = get_caller()
+        command = get_command(driver_command, params or {})
+        selector = get_selector(params or {})
+        start = time.perf_counter()
+        response = None
+
+        try:
+            response = execute(driver_command, params)
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+
+            with lock:
+                record("command", command, elapsed)
+                record("caller", caller, elapsed)
+                if selector:
+                    record("selector", selector, elapsed)
+
+                # Elements returned by scripts are charged to the calling script
+                if response and response.get("value") is not None:
+                    remember_elements(response["value"], selector or caller)
+
+    driver.execute = profiled_execute
+    return driver
+
+
+def format_ranking(title, timings, work_items):
+    lines = [
+        f"\n{title:<70}{'calls':>8}{'total s':>10}{'ms/call':>10}"
+        f"{'calls/item':>12}{'ms/item':>10}"
+    ]
+    ranked = sorted(timings.items(), key=lambda item: item[1]["total_s"], reverse=True)
+
+    for name, timing in ranked[:REPORT_SIZE]:
+        name = name if len(name) <= 68 else f"{name[:65]}..."
+        lines.append(
+            f"{name:<70}{timing['count']:>8}{timing['total_s']:>10.2f}"
+            f"{timing['total_s'] / timing['count'] * 1000:>10.1f}"
+            f"{timing['count'] / work_items:>12.1f}"
+            f"{timing['total_s'] / work_items * 1000:>10.1f}"
+        )
+
+    return lines
+
+
+def report_profile():
+    if not profiles["command"]:
+        return
+
+    work_items = max(counters.get("work_items", 0), 1)
+
+    with lock:
+        lines = [f"WebDriver commands for {work_items} work items"]
+        lines += format_ranking("command", profiles["command"], work_items)
+        lines += format_ranking("caller", profiles["caller"], work_items)
+        lines += format_ranking("selector", profiles["selector"], work_items)
+
+    message = "\n".join(lines)
+    print(message)
+    logging.info(message)
@@ -0,0 +1,217 @@
+"""
+Record and replay of WebDriver sessions
+
+Recording wraps the command executor of a driver and writes every WebDriver
+command with its raw response (DOM snapshots, tooltip texts, window switches,
+download URLs, errors) as JSON lines, after a header holding the settings
+which shape the commands. Typed keys and credentials in URLs are redacted.
+
+Replay creates a driver whose command executor answers from a recording, so
+the scraper runs without a browser or network. Responses are matched by
+command and parameters in recorded order. Polls which repeat more often than
+during the recording get the previous answer again, polls which repeat less
+often skip ahead and anything else raises a RuntimeError. Sleeps are skipped
+with a virtual clock so waits for missing elements cost no time.
+"""
+
+import contextlib
+import gzip
+import json
+import time
+from datetime import datetime, timezone
+from functools import partial
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+
+import config
+from jsonl_utils import open_results
+from logger import logging
+
+# Settings which end up in command parameters, applied again on replay
+RECORDED_SETTINGS = [
+    "BASE_URL",
+    "BROWSER_PROFILE",
+    "ON_PREM",
+    "DOM_QUIET_PERIOD",
+    "DOM_IDLE_TIMEOUT",
+    # Selects which sections are navigated to
+    "SECTIONS",
+    # Caps the item timeout passed to the batched in-page scripts
+    "MAX_WAIT_TIME",
+]
+REDACTED = "<redacted>"
+# Recorded commands searched for a response the replay skipped ahead to
+LOOKAHEAD = 50
+SESSION_ID = "replay"
+
+
+def redact(command, params):
+    params = {key: value for key, value in params.items() if key != "sessionId"}
+
+    if command == "sendKeysToElement":
+        params.update({"text": REDACTED, "value": [REDACTED]})
+    elif command == "get" and urlparse(params.get("url", "")).password:
+        url = urlparse(params["url"])
+        params["url"] = url._replace(netloc=f"{REDACTED}@{url.hostname}").geturl()
+
+    return params
+
+
+def get_key(command, params):
+    return json.dumps([command, redact(command, params or {})], sort_keys=True)
+
+
+def open_recording(path):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8")
+
+    return open(path, "w", encoding="utf-8")
+
+
+def record_driver(driver, path):
+    file = open_recording(path)
+    file.write(
+        json.dumps(
+            {
+                "recorded": datetime.now(timezone.utc).isoformat(),
+                "settings": {name: getattr(config, name) for name in RECORDED_SETTINGS},
+            }
+        )
+        + "\n"
+    )
+
+    command_executor = driver.command_executor
+    execute = command_executor.execute
+
+    def recording_execute(command, params):
+        response = execute(command, params)
+
+        if not file.closed:
+            entry = {
+                "command": command,
+                "params": redact(command, params or {}),
+                "response": response,
+            }
+            file.write(json.dumps(entry) + "\n")
+
+        if command == "quit":
+            file.close()
+            logging.info(f"Saved WebDriver recording to {path}")
+
+        return response
+
+    command_executor.execute = recording_execute
+    logging.info(f"Recording WebDriver commands to {path}")
+    return driver
+
+
+def load_recording(path):
+    with open_results(path) as file:
+        header = json.loads(file.readline())
+        entries = [json.loads(line) for line in file if line.strip()]
+
+    for entry in entries:
+        entry["key"] = get_key(entry["command"], entry["params"])
+
+    return header, entries
+
+
+def apply_recorded_settings(header):
+    for name, value in header["settings"].items():
+        setattr(config, name, value)
+
+
+def replay_connection(entries):
+    position = 0
+    previous = None
+    skipped = 0
+
+    def execute(command, params):
+        nonlocal position, previous, skipped
+
+        if command == "newSession":
+            return {"value": {"sessionId": SESSION_ID, "capabilities": {}}}
+
+        key = get_key(command, params)
+
+        if position < len(entries) and entries[position]["key"] == key:
+            match = position
+        elif previous is not None and previous["key"] == key:
+            return previous["response"]
+        else:
+            match = next(
+                (
+                    index
+                    for index in range(
+                        position, min(position + LOOKAHEAD, len(entries))
+                    )
+                    if entries[index]["key"] == key
+                ),
+                None,
+            )
+
+            if match is None:
+                if command == "quit":
+                    return {"value": None}
+                raise RuntimeError(
+                    f"No recorded response for {key} after command {position} "
+                    f"of {len(entries)}, the scrape diverged from the recording"
+                )
+
+            skipped += match - position
+            logging.info(f"Replay skipped {match - position} recorded commands")
+
+        previous = entries[match]
+        position = match + 1
+        return previous["response"]
+
+    def get_progress():
+        return {"replayed": position, "recorded": len(entries), "skipped": skipped}
+
+    return SimpleNamespace(
+        execute=execute, get_progress=get_progress, close=lambda: None
+    )
+
+
+def execute_cdp_cmd(driver, cmd, cmd_args):
+    response = driver.execute("executeCdpCommand", {"cmd": cmd, "params": cmd_args})
+    return response["value"]
+
+
+def create_replay_driver(path):
+    header, entries = load_recording(path)
+    apply_recorded_settings(header)
+
+    driver = webdriver.Remote(
+        command_executor=replay_connection(entries), options=ChromeOptions()
+    )
+    # Chrome specific, the remote driver has no CDP support of its own
+    driver.execute_cdp_cmd = partial(execute_cdp_cmd, driver)
+    logging.info(f"Replaying {len(entries)} WebDriver commands from {path}")
+
+    return driver
+
+
+@contextlib.contextmanager
+def virtual_clock():
+    """
+    Make time.sleep return immediately, advancing time.monotonic instead, so
+    timeouts still expire in the same order.
+    """
+    sleep, monotonic = time.sleep, time.monotonic
+    offset = 0.0
+
+    def virtual_sleep(seconds):
+        nonlocal offset
+        offset += max(seconds, 0)
+
+    time.sleep = virtual_sleep
+    time.monotonic = lambda: monotonic() + offset
+
+    try:
+        yield
+    finally:
+        time.sleep, time.monotonic = sleep, monotonic
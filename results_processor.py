@@ -1,49 +1,128 @@
 import json
 import os
+import re
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from urllib.parse import urlparse
 
 import config
 from action_utils import add_line_break, convert_date, create_symlink
+from blob_utils import load_blob_index, place_attachment, save_blob_index
+from jsonl_utils import read_results
 from logger import logging
-
-
-def create_history_metadata(history, history_path):
+from metrics_utils import span
+from section_utils import get_sections, project_sections
+
+# Folders holding a work item's own content, as opposed to its children
+WORK_ITEM_SECTIONS = ["history", "discussion", "development", "related", "attachments"]
+# Folder written for each scraped section, see section_utils.SECTIONS
+SECTION_FOLDERS = {
+    "history": "history",
+    "discussions": "discussion",
+    "development": "development",
+    "related_work": "related",
+    "attachments": "attachments",
+}
+WRITE_BUFFER_SIZE = 1024 * 1024
+# Work item folders are named <Task id>_<Title>, anything else in data is kept
+WORK_ITEM_FOLDER_PATTERN = re.compile(r"^\d+_")
+
+
+def new_write_plan():
+    return {
+        "clear": [],
+        "remove": [],
+        "directories": [],
+        "files": {},
+        "attachments": [],
+    }
+
+
+def plan_history_metadata(history, history_path, plan):
     for item in history:
         formatted_date = convert_date(item["Date"], date_format="%a %d/%m/%Y %H:%M")
         title = item["Title"].replace(" ", "_")
         filename = f"{formatted_date}_{item['User']}_{title}.md"
         path = Path(history_path, filename)
-        with open(path, "w", encoding="utf-8") as file:
-            file.write(f"* Date: {item['Date']}\n")
-            file.write(f"   * User: {item['User']}\n")
-            file.write(f"   * Title: {item['Title']}\n")
-
-            if item["Fields"]:
-                file.write("   * Fields\n")
-                fields = item["Fields"]
-
-                for field in fields:
-                    file.write(f"       * {field['name']}\n")
-                    file.write(f"           * Old Value: {field['old_value']}\n")
-                    file.write(f"           * New Value: {field['new_value']}\n")
-
-            if links := item.get("Links"):
-                for link in links:
-                    file.write("   * Links\n")
-                    file.write(f"       * Type: {link['Type']}\n")
-                    file.write(
-                        f"       * Link to item file: {link['Link to item file']}\n"
-                    )
-                    file.write(f"       * Title: {link['Title']}\n")
+
+        lines = [
+            f"* Date: {item['Date']}\n",
+            f"   * User: {item['User']}\n",
+            f"   * Title: {item['Title']}\n",
+        ]
+
+        if item["Fields"]:
+            lines.append("   * Fields\n")
+            fields = item["Fields"]
+
+            for field in fields:
+                lines.append(f"       * {field['name']}\n")
+                lines.append(f"           * Old Value: {field['old_value']}\n")
+                lines.append(f"           * New Value: {field['new_value']}\n")
+
+        if links := item.get("Links"):
+            for link in links:
+                lines.append("   * Links\n")
+                lines.append(f"       * Type: {link['Type']}\n")
+                lines.append(
+                    f"       * Link to item file: {link['Link to item file']}\n"
+                )
+                lines.append(f"       * Title: {link['Title']}\n")
+
+        plan["files"][path] = "".join(lines)
+
+
+def clear_work_item_folder(dir_path):
+    if not os.path.isdir(dir_path):
+        return
+
+    # Children are kept as they are processed on their own
+    for item in Path(dir_path).iterdir():
+        if item.is_symlink() or item.is_file():
+            item.unlink()
+        elif item.name in WORK_ITEM_SECTIONS:
+            shutil.rmtree(item)
+
+
+def write_file(path, content):
+    with open(path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as file:
+        file.write(content)
+
+
+def execute_write_plan(plan, workers=config.WRITE_WORKERS):
+    for dir_path in plan["clear"]:
+        clear_work_item_folder(dir_path)
+
+    for section_path in plan["remove"]:
+        shutil.rmtree(section_path, ignore_errors=True)
+
+    for dir_path in plan["directories"]:
+        os.makedirs(dir_path, exist_ok=True)
+
+    # Directories exist now, so files can be written in any order
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(write_file, path, content)
+            for path, content in plan["files"].items()
+        ]
+        futures += [
+            executor.submit(place_attachment, url, source, destination)
+            # The same attachment can be listed twice in a subtree
+            for url, source, destination in dict.fromkeys(plan["attachments"])
+        ]
+
+        for future in futures:
+            future.result()
 
 
 def create_directory_hierarchy(
     dicts,
-    path=Path(Path.cwd(), "data"),
-    attachments_path=(Path(Path.cwd(), "data", "attachments")),
+    path=None,
+    attachments_path=None,
     indent=0,
+    index=None,
+    plan=None,
 ):
     exclude_fields = [
         "children",
@@ -52,8 +131,24 @@ def create_directory_hierarchy(
         "history",
         "attachments",
         "development",
+        "cached",
     ]
 
+    # Resolved per call, the working directory can change after import (replay)
+    path = Path(Path.cwd(), "data") if path is None else path
+    attachments_path = (
+        Path(path, "attachments") if attachments_path is None else attachments_path
+    )
+
+    # The top level call plans the whole subtree, then writes it in one go
+    if plan is None:
+        plan = new_write_plan()
+        create_directory_hierarchy(
+            dicts, path, attachments_path, indent, index, plan=plan
+        )
+        execute_write_plan(plan)
+        return
+
     for d in dicts:
         dir_name = f"{d['Task id']}_{d['Title'].replace(' ','_')}"
         dir_path = Path(path, dir_name)
@@ -64,19 +159,51 @@ def create_directory_hierarchy(
         discussion_attachments_path = Path(discussion_path, "attachments")
         related_works_path = Path(dir_path, "related")
 
+        if index is not None:
+            index.setdefault(str(d["Task id"]), dir_path)
+
+        # Unchanged work items keep the folder written by a previous run
+        if d.get("cached") and os.path.isdir(dir_path):
+            print(" " * indent + dir_name + " (unchanged)")
+
+            # Sections left out of this run are dropped, as for changed items
+            plan["remove"] += [
+                Path(dir_path, folder)
+                for section, folder in SECTION_FOLDERS.items()
+                if section not in d
+            ]
+
+            if "children" in d:
+                create_directory_hierarchy(
+                    d["children"],
+                    dir_path,
+                    attachments_path,
+                    indent + 2,
+                    index,
+                    plan,
+                )
+            continue
+
+        d["cached"] = False
+
         print(" " * indent + dir_name)
         logging.info(f"Creating directory in {dir_path}")
-        os.makedirs(dir_path, exist_ok=True)
-        os.makedirs(history_path, exist_ok=True)
-        os.makedirs(discussion_path, exist_ok=True)
-        shutil.rmtree(discussion_path)
-        os.makedirs(discussion_attachments_path, exist_ok=True)
-        os.makedirs(development_path, exist_ok=True)
-        os.makedirs(work_item_attachments_path, exist_ok=True)
-        os.makedirs(related_works_path, exist_ok=True)
+        plan["clear"].append(dir_path)
+        plan["directories"].append(dir_path)
+        plan["directories"] += [
+            section_path
+            for section, section_path in [
+                ("history", history_path),
+                ("discussions", discussion_attachments_path),
+                ("development", development_path),
+                ("attachments", work_item_attachments_path),
+                ("related_work", related_works_path),
+            ]
+            if section in d
+        ]
 
         if "history" in d and d["history"]:
-            create_history_metadata(d.pop("history"), history_path)
+            plan_history_metadata(d.pop("history"), history_path, plan)
 
         if "discussions" in d and d["discussions"]:
             for discussion in d.pop("discussions"):
@@ -85,78 +212,104 @@ def create_directory_hierarchy(
                 new_date = convert_date(
                     discussion["Date"], new_format="%B %d, %Y %H:%m:%S %p"
                 )
-                with open(
-                    Path(discussion_path, file_name), "a+", encoding="utf-8"
-                ) as file:
-                    file.write(
-                        f"* Title: <{discussion['User']} commented {new_date}>\n"
-                    )
-                    file.write(
-                        f"* Content: {add_line_break(discussion['Content'], 90)}\n"
-                    )
-
-                    file.write("* Absolute link to attachment/s\n")
-
-                    if discussion["attachments"]:
-                        for attachment in discussion["attachments"]:
-                            source = Path(attachments_path, attachment["filename"])
-                            destination = Path(
-                                discussion_attachments_path, attachment["filename"]
-                            )
-                            file.write(
-                                f"  * [{attachment['filename']}]({destination})\n"
-                            )
-
-                            if os.path.exists(source):
-                                shutil.move(source, destination)
+                lines = [
+                    f"* Title: <{discussion['User']} commented {new_date}>\n",
+                    f"* Content: {add_line_break(discussion['Content'], 90)}\n",
+                    "* Absolute link to attachment/s\n",
+                ]
+
+                if discussion["attachments"]:
+                    for attachment in discussion["attachments"]:
+                        source = Path(attachments_path, attachment["filename"])
+                        destination = Path(
+                            discussion_attachments_path, attachment["filename"]
+                        )
+                        lines.append(f"  * [{attachment['filename']}]({destination})\n")
+                        plan["attachments"].append(
+                            (attachment["url"], source, destination)
+                        )
+
+                # Comments posted in the same second by the same user share a file
+                discussion_file = Path(discussion_path, file_name)
+                plan["files"][discussion_file] = plan["files"].get(
+                    discussion_file, ""
+                ) + "".join(lines)
 
         if d.get("attachments"):
             for attachment in d["attachments"]:
                 source = Path(attachments_path, attachment["filename"])
                 destination = Path(work_item_attachments_path, attachment["filename"])
+                plan["attachments"].append((attachment["url"], source, destination))
 
-                if os.path.exists(source):
-                    shutil.move(source, destination)
-
-        with open(Path(dir_path, "description.md"), "w", encoding="utf-8") as file:
-            if d["description"]:
-                file.write(str(d.pop("description")))
+        description = ""
+        if d["description"]:
+            description = str(d.pop("description"))
+        plan["files"][Path(dir_path, "description.md")] = description
 
-        with open(Path(dir_path, "metadata.md"), "w", encoding="utf-8") as file:
-            for key, value in d.items():
-                if key not in exclude_fields:
-                    file.write(f"* {key}: {value}\n")
+        plan["files"][Path(dir_path, "metadata.md")] = "".join(
+            f"* {key}: {value}\n"
+            for key, value in d.items()
+            if key not in exclude_fields
+        )
 
-        with open(Path(dir_path, "origin.md"), "w", encoding="utf-8") as file:
-            scheme, domain, url_path = urlparse(config.BASE_URL)[0:3]
-            url_path = "/".join(url_path.split("/")[1:3])
-            origin = f"{scheme}://{domain}/{url_path}/_workitems/edit/{d['Task id']}"
-            file.write(origin)
+        scheme, domain, url_path = urlparse(config.BASE_URL)[0:3]
+        url_path = "/".join(url_path.split("/")[1:3])
+        origin = f"{scheme}://{domain}/{url_path}/_workitems/edit/{d['Task id']}"
+        plan["files"][Path(dir_path, "origin.md")] = origin
 
-        for development in d.pop("development"):
+        for development in d.pop("development", []):
             change_filename = Path(
                 development_path, f"changeset_{development['ID']}.md"
             )
-            with open(change_filename, "w", encoding="utf-8") as file:
-                if change_sets := development["change_sets"]:
-                    for change_set in change_sets:
-                        file.write(f"* 'File Name': {change_set['File Name']}\n")
-                        file.write(f"* 'Path': {change_set['Path']}\n")
-                        file.write(f"* 'Content': {change_set['content']}\n")
+            lines = []
+            if change_sets := development["change_sets"]:
+                for change_set in change_sets:
+                    lines.append(f"* 'File Name': {change_set['File Name']}\n")
+                    lines.append(f"* 'Path': {change_set['Path']}\n")
+                    lines.append(f"* 'Content': {change_set['content']}\n")
+            plan["files"][change_filename] = "".join(lines)
 
         if "children" in d:
-            create_directory_hierarchy(d["children"], dir_path, indent=indent + 2)
+            create_directory_hierarchy(
+                d["children"], dir_path, attachments_path, indent + 2, index, plan
+            )
+
+
+def load_work_item_index(directory: Path):
+    index = {}
+
+    for root, dirs, _ in os.walk(directory):
+        for dir_name in dirs:
+            if match := re.match(r"^(\d+)_", dir_name):
+                index.setdefault(match.group(1), Path(root, dir_name).resolve())
+
+    return index
+
 
+def save_manifest(index, manifest_file=config.MANIFEST_FILE):
+    if not manifest_file:
+        return
+
+    with open(manifest_file, "w", encoding="utf-8") as file:
+        json.dump({task_id: str(path) for task_id, path in index.items()}, file)
+
+
+def create_related_work_contents(scrape_results, path: Path = Path("data"), index=None):
+    # Resolve work item folders by ID instead of walking the tree per link
+    if index is None:
+        index = load_work_item_index(Path(Path.cwd(), path))
 
-def create_related_work_contents(scrape_results, path: Path = Path("data")):
     for item in scrape_results:
         task_id = item.get("Task id")
         task_title = item.get("Title").replace(" ", "_")
         folder_name = f"{task_id}_{task_title}"
         dir_path = Path(path, folder_name)
 
-        folder_path = [i for i in Path(Path.cwd(), path).resolve().rglob(folder_name)]
-        related_dir = Path(folder_path[0], "related")
+        related_dir = Path(index.get(str(task_id), dir_path), "related")
+
+        # Related work is always scraped so links are rebuilt every run
+        shutil.rmtree(related_dir, ignore_errors=True)
+        os.makedirs(related_dir)
 
         for related_work in item.get("related_work"):
             related_work_type = related_work.get("type")
@@ -168,18 +321,13 @@ def create_related_work_contents(scrape_results, path: Path = Path("data")):
 
                 target_path = Path(related_dir, work_item_target)
 
-                work_item_path = [
-                    i
-                    for i in Path(Path.cwd(), "data")
-                    .resolve()
-                    .rglob(work_item_file_name)
-                ]
+                work_item_id = work_item_file_name.split("_", 1)[0]
+                work_item_path = index.get(work_item_id)
 
                 if not work_item_path:
                     create_symlink("/non-existent/another-project-source", target_path)
                     continue
 
-                work_item_path = work_item_path[0]
                 create_symlink(work_item_path, target_path)
 
                 related_md_filename = Path(related_dir, f"{work_item_target}.md")
@@ -189,7 +337,7 @@ def create_related_work_contents(scrape_results, path: Path = Path("data")):
                     file.write(f"    * Last update: {work_item_updated_at}\n\n")
 
         if "children" in item:
-            create_related_work_contents(item["children"], dir_path)
+            create_related_work_contents(item["children"], dir_path, index)
 
 
 def cleanup_existing_folders(directory: Path):
@@ -199,17 +347,69 @@ def cleanup_existing_folders(directory: Path):
         if os.path.islink(item_path):
             os.unlink(item_path)
 
-        if item.is_dir() and item.name != "attachments":
+        elif item.is_dir() and WORK_ITEM_FOLDER_PATTERN.match(item.name):
             shutil.rmtree(item_path)
 
 
-def post_process_results(save_file, downloads_directory):
-    with open(save_file, "r", encoding="utf-8") as file:
-        scrape_result = json.load(file)
-        cleanup_existing_folders(Path(Path.cwd(), "data"))
-        create_directory_hierarchy(scrape_result)
-        create_related_work_contents(scrape_result)
+def get_work_item_paths(scrape_results, path):
+    paths = set()
+
+    for item in scrape_results:
+        dir_path = Path(path, f"{item['Task id']}_{item['Title'].replace(' ', '_')}")
+        paths.add(dir_path)
+        paths.update(get_work_item_paths(item.get("children", []), dir_path))
+
+    return paths
+
+
+def remove_stale_folders(directory: Path, expected_paths):
+    for item in directory.iterdir():
+        if item.is_symlink() or not item.is_dir():
+            continue
+
+        if item in expected_paths:
+            remove_stale_folders(item, expected_paths)
+        elif WORK_ITEM_FOLDER_PATTERN.match(item.name):
+            logging.info(f"Removing stale work item folder {item}")
+            shutil.rmtree(item)
+
+
+def post_process_results(
+    save_file, downloads_directory, incremental=False, sections=None
+):
+    data_path = Path(Path.cwd(), "data")
+    sections = get_sections() if sections is None else sections
+    load_blob_index()
+
+    # Stream the results once per stage so only one work item tree is in memory
+    with span("cleanup"):
+        if incremental:
+            expected_paths = set()
+            for scrape_result in read_results(save_file):
+                expected_paths.update(get_work_item_paths([scrape_result], data_path))
+
+            remove_stale_folders(data_path, expected_paths)
+        else:
+            cleanup_existing_folders(data_path)
+
+    index = {}
+    with span("directory_hierarchy"):
+        for scrape_result in read_results(save_file):
+            scrape_result = project_sections(scrape_result, sections)
+            create_directory_hierarchy(
+                [scrape_result], data_path, downloads_directory, index=index
+            )
+
+    with span("manifest"):
+        save_manifest(index)
+        save_blob_index()
+
+    if "related_work" in sections:
+        with span("related_work"):
+            for scrape_result in read_results(save_file):
+                create_related_work_contents([scrape_result], data_path, index)
 
-        # Clean downloads directory after post process
+    # Clean downloads directory after post process
+    with span("remove_downloads"):
         if downloads_directory.exists() and downloads_directory.is_dir():
             shutil.rmtree(downloads_directory)
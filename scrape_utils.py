@@ -1,87 +1,306 @@
 import re
-import time
 import urllib.parse
 
 from bs4 import BeautifulSoup
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.wait import WebDriverWait
+from selenium.webdriver.common.by import By
 
 import config
 from action_utils import (
     click_button_by_xpath,
     convert_date,
     convert_to_markdown,
-    expand_collapsed_by_xpath,
     find_element_by_xpath,
     find_elements_by_xpath,
-    get_input_value,
+    format_description,
+    get_discussion_attachment,
     get_text,
+    html_to_markdown,
+    retry_with_backoff,
     show_more,
 )
+from development_utils import (
+    get_cached_changeset,
+    get_changeset_key,
+    open_development_tab,
+)
+from download_utils import download_attachment
+from metrics_utils import increment
+
+BASIC_FIELD_LABELS = [
+    "ID Field",
+    "Assigned To Field",
+    "State Field",
+    "Area Path",
+    "Iteration Path",
+    "Priority",
+    "Remaining Work",
+    "Activity",
+    "Blocked",
+    "Effort",
+    "Severity",
+]
+
+RICH_TEXT_LABELS = [
+    "Description",
+    "Repro Steps",
+    "System Info",
+    "Acceptance Criteria",
+    "Resolution",
+]
+
+# Collects every basic field (including live input values) and the rich text
+# sections of the dialog in a single WebDriver round trip
+DIALOG_SNAPSHOT_SCRIPT = """
+const [dialog, labels, richTextLabels] = arguments;
+const fields = {};
+for (const element of dialog.querySelectorAll("[aria-label]")) {
+    const label = element.getAttribute("aria-label");
+    if (!labels.includes(label)) continue;
+    const target =
+        label === "Assigned To Field"
+            ? element.querySelector("span.text-cursor")
+            : element;
+    if (!target) {
+        fields[label] = null;
+    } else if (target.tagName === "INPUT") {
+        fields[label] = target.value;
+    } else {
+        fields[label] = target.textContent || null;
+    }
+}
+const richText = {};
+for (const label of richTextLabels) {
+    const element = dialog.querySelector(`[aria-label="${label}"]`);
+    richText[label] = element ? element.outerHTML : null;
+}
+const hasSection = (label) =>
+    dialog.querySelector(`[aria-label="${label}"]`) !== null;
+const updated = document.evaluate(
+    ".//*[starts-with(normalize-space(text()), 'Updated by')]",
+    dialog,
+    null,
+    XPathResult.FIRST_ORDERED_NODE_TYPE,
+    null
+).singleNodeValue;
+return {
+    fields: fields,
+    // The text is usually relative, the title holds the full date
+    changed_date: updated
+        ? updated.getAttribute("title") ||
+          (updated.querySelector("[title]") || {}).title ||
+          updated.textContent.trim()
+        : null,
+    rich_text: richText,
+    repro_steps_section: hasSection("Repro Steps section."),
+    resolution_section: hasSection("Resolution section."),
+};
+"""
+
+
+# Shared by the in-page scripts below
+SETTLE_SCRIPT = """
+// Calls back once condition returned the same truthy value for quietMs
+function settle(condition, quietMs, timeoutMs, callback) {
+    const begin = performance.now();
+    let last = null;
+    let since = begin;
+    (function check() {
+        const value = condition();
+        const now = performance.now();
+        if (value !== last) {
+            last = value;
+            since = now;
+        }
+        if ((value && now - since >= quietMs) || now - begin > timeoutMs) {
+            callback(value);
+            return;
+        }
+        setTimeout(check, 10);
+    })();
+}
+"""
+
+# Expands the collapsed history groups, then opens the history entries from
+# index start in turn, returning the rendered viewer HTML of each until the
+# entries newer than revision sinceRev are read or the batch time runs out.
+# Entries are listed newest first, so entry i is revision count - i, and the
+# count is returned as the revision read up to.
+HISTORY_SCRIPT = SETTLE_SCRIPT + """
+const [dialog, start, sinceRev, batchMs, itemTimeoutMs, done] = arguments;
+const started = performance.now();
+const getItems = () =>
+    [...dialog.querySelectorAll("div.history-item-summary, div.history-item-selected")]
+        .filter(
+            (item) =>
+                item.className === "history-item-summary" ||
+                item.classList.contains("history-item-selected")
+        );
+const getViewer = () => dialog.querySelector('div[class="history-item-viewer"]');
+const getCollapsed = () =>
+    dialog.querySelectorAll('div[class="history-item-list"] div[aria-expanded="false"]');
+const results = [];
+let index = start;
+let end = null;
+let count = null;
+
+function next() {
+    if (index >= end || (results.length && performance.now() - started > batchMs)) {
+        done({ items: results, next: index < end ? index : null, revision: count });
+        return;
+    }
+    const item = getItems()[index];
+    const viewer = getViewer();
+    const selected = item.classList.contains("history-item-selected");
+    const before = viewer ? viewer.innerHTML : null;
+    item.click();
+    // The viewer is rendered once it holds a date and changed since the click
+    settle(
+        () => {
+            const viewer = getViewer();
+            if (!viewer || !viewer.querySelector(".history-item-date")) return null;
+            return selected || viewer.innerHTML !== before ? viewer.innerHTML : null;
+        },
+        10,
+        itemTimeoutMs,
+        (html) => {
+            results.push(html || (getViewer() ? getViewer().innerHTML : null));
+            index++;
+            setTimeout(next, 0);
+        }
+    );
+}
+
+// Collapsed groups of older entries render their entries after expanding
+const collapsed = getCollapsed();
+collapsed.forEach((group) => group.click());
+settle(
+    () => (getCollapsed().length ? null : String(getItems().length)),
+    collapsed.length ? 200 : 0,
+    itemTimeoutMs,
+    () => {
+        count = getItems().length;
+        end = Math.max(count - sinceRev, 0);
+        next();
+    }
+);
+"""
+
+# Reads the "Updated by" text of the related work rows from index start, from
+# the title of their Updated label or else by hovering it and reading (then
+# removing) the popup, until every row is read or the batch time runs out.
+# Rows are the same aria-level divs the grid HTML returned with the first
+# batch is parsed into, label rows and rows without the label give null.
+RELATED_UPDATED_SCRIPT = SETTLE_SCRIPT + """
+const [canvas, start, batchMs, itemTimeoutMs, done] = arguments;
+const started = performance.now();
+const rows = [...canvas.querySelectorAll("div[aria-level]")];
+const html = start === 0 ? canvas.outerHTML : null;
+const results = [];
+let index = start;
+
+const getPopup = () =>
+    document.evaluate(
+        "(//div[contains(text(), 'Updated by') and contains(@class, 'popup-content-container')])[last()]",
+        document,
+        null,
+        XPathResult.FIRST_ORDERED_NODE_TYPE,
+        null
+    ).singleNodeValue;
+const getLabel = (row) =>
+    [...row.querySelectorAll("span")].find((span) =>
+        [...span.childNodes].some(
+            (node) => node.nodeType === Node.TEXT_NODE && node.data.includes("Updated")
+        )
+    );
+
+function finish(text) {
+    results.push(text);
+    index++;
+    setTimeout(next, 0);
+}
+
+function next() {
+    if (index >= rows.length || (results.length && performance.now() - started > batchMs)) {
+        done({ html: html, updated: results, next: index < rows.length ? index : null });
+        return;
+    }
+    const row = rows[index];
+    const label = row.getAttribute("aria-level") !== "1" && getLabel(row);
+    if (!label) {
+        finish(null);
+        return;
+    }
+    if ((label.title || "").startsWith("Updated by")) {
+        finish(label.title);
+        return;
+    }
+    label.dispatchEvent(new MouseEvent("mouseover", { bubbles: true }));
+    settle(getPopup, 0, itemTimeoutMs, (popup) => {
+        const text = popup ? popup.innerText : null;
+        if (popup) popup.parentNode.removeChild(popup);
+        finish(text);
+    });
+}
+
+next();
+"""
+
+# Reads the full date of each comment from the TooltipHost content prop of its
+# timestamp, the text the hover tooltip shows, without hovering. Only texts
+# holding a year and a time of day are taken, comments without one (or whose
+# React props cannot be read) get their title attribute if it is a date or null.
+DISCUSSION_DATES_SCRIPT = """
+const container = arguments[0];
+const isDate = (text) =>
+    typeof text === "string" &&
+    text.length < 64 &&
+    /\\b\\d{4}\\b/.test(text) &&
+    /\\b\\d{1,2}:\\d{2}\\b/.test(text);
+const getFiber = (element) => {
+    const key = Object.keys(element).find(
+        (name) => name.startsWith("__reactFiber$") || name.startsWith("__reactInternalInstance$")
+    );
+    return key ? element[key] : null;
+};
+const getTooltip = (element) => {
+    // The tooltip host wraps the timestamp closely, stop before the comment
+    let fiber = getFiber(element);
+    for (let depth = 0; fiber && depth < 10; depth++, fiber = fiber.return) {
+        const content = fiber.memoizedProps && fiber.memoizedProps.content;
+        if (isDate(content)) return content;
+    }
+    return isDate(element.title) ? element.title : null;
+};
+return [...container.querySelectorAll("div[class='comment-header-left']")].map((header) => {
+    const timestamp = header.querySelector("[class='comment-timestamp']");
+    return timestamp ? getTooltip(timestamp) : null;
+});
+"""
 
+# Seconds of rows read per in-page script call, below the script timeout
+SCRIPT_BATCH_TIME = 10
+SCRIPT_ITEM_TIMEOUT = 10
 
-def scrape_basic_fields(dialog_box):
-    labels = [
-        "ID Field",
-        "Assigned To Field",
-        "State Field",
-        "Area Path",
-        "Iteration Path",
-        "Priority",
-        "Remaining Work",
-        "Activity",
-        "Blocked",
-        "Effort",
-        "Severity",
-    ]
-
-    basic_fields = {}
-
-    html = dialog_box.get_attribute("innerHTML")
-    soup = BeautifulSoup(html, "html.parser")
-
-    for element in soup.find_all(attrs={"aria-label": True}):
-        attribute = element.get("aria-label")
-
-        if attribute in labels:
-            if attribute == "Assigned To Field":
-                element = element.find("span", {"class": "text-cursor"})
-
-            if element.name == "input":
-                value = element.get("value")
-
-                if "value" not in element:
-                    input_xpath = f".//input[@aria-label='{attribute}']"
-                    value = get_input_value(dialog_box, input_xpath)
-            else:
-                value = element.text if element.text else None
 
-            basic_fields[attribute] = value
+def get_script_item_timeout():
+    return min(config.MAX_WAIT_TIME or SCRIPT_ITEM_TIMEOUT, SCRIPT_ITEM_TIMEOUT)
 
-    if soup.find(attrs={"aria-label": "Repro Steps section."}):
-        repro_steps_element = soup.find(attrs={"aria-label": "Repro Steps"})
-        system_info_element = soup.find(attrs={"aria-label": "System Info"})
-        acceptance_element = soup.find(attrs={"aria-label": "Acceptance Criteria"})
 
-        retro = f"* Repro Steps\n** {convert_to_markdown(repro_steps_element)}\n"
-        system_info = f"* System Info\n** {convert_to_markdown(system_info_element)}\n"
-        acceptance = (
-            f"* Acceptance criteria \n** {convert_to_markdown(acceptance_element)}\n"
-        )
+def snapshot_dialog_fields(dialog_box):
+    return dialog_box.parent.execute_script(
+        DIALOG_SNAPSHOT_SCRIPT, dialog_box, BASIC_FIELD_LABELS, RICH_TEXT_LABELS
+    )
 
-        basic_fields["Description"] = retro + system_info + acceptance
-    elif soup.find(attrs={"aria-label": "Resolution section."}):
-        description_element = soup.find(attrs={"aria-label": "Description"})
-        resolution_element = soup.find(attrs={"aria-label": "Resolution"})
-        description = f"* Description\n\t* {convert_to_markdown(description_element)}\n"
-        resolution = f"* Repro Steps\n\t* {convert_to_markdown(resolution_element)}\n"
 
-        basic_fields["Description"] = description + resolution
+def parse_basic_fields(snapshot):
+    basic_fields = dict(snapshot["fields"])
+    rich_text = {
+        label: html_to_markdown(html) for label, html in snapshot["rich_text"].items()
+    }
 
-    else:
-        description_element = soup.find(attrs={"aria-label": "Description"})
-        description = f"* Description\n\t* {convert_to_markdown(description_element)}\n"
-        basic_fields["Description"] = description
+    basic_fields["Description"] = format_description(
+        rich_text, snapshot["repro_steps_section"], snapshot["resolution_section"]
+    )
 
     return {
         "Task id": basic_fields["ID Field"],
@@ -99,13 +318,17 @@ def scrape_basic_fields(dialog_box):
     }
 
 
+def scrape_basic_fields(dialog_box):
+    return parse_basic_fields(snapshot_dialog_fields(dialog_box))
+
+
 def scrape_attachments(driver):
     dialog_xpath = "//div[@role='dialog'][last()]"
     attachments_tab = f"{dialog_xpath}//li[@aria-label='Attachments']"
     details_tab = f"{dialog_xpath}//li[@aria-label='Details']"
 
     # Attachment count
-    attachments_count = get_text(driver, f"{attachments_tab}/span[2]")
+    attachments_count = get_text(driver, f"{attachments_tab}/span[2]", breaker=False)
 
     if attachments_count is None:
         print("No attachments:", attachments_count)
@@ -116,33 +339,21 @@ def scrape_attachments(driver):
 
     # Retrieve attachment links
     attachments_data = []
-    retry = 0
-    grid_rows = []
-
-    while retry < config.MAX_RETRIES:
-        grid_rows = find_elements_by_xpath(
-            driver,
-            f"({dialog_xpath}//div[@class='grid-content-spacer'])[last()]/parent::div//div[@role='row']",
-        )
-
-        if grid_rows:
-            break
-
-        if retry == config.MAX_RETRIES:
-            print("Error: Unable to find history items!!")
-            return
-
-        retry += 1
-        print(f"Retrying to find attachment row items... {retry}/{config.MAX_RETRIES}")
+    grid_rows_xpath = f"({dialog_xpath}//div[@class='grid-content-spacer'])[last()]/parent::div//div[@role='row']"
+    grid_rows = retry_with_backoff(
+        lambda timeout: find_elements_by_xpath(driver, grid_rows_xpath, timeout),
+        description="to find attachment row items",
+    )
 
-    retry = 0
-    attachment_href = None
+    if not grid_rows:
+        print("Error: Unable to find attachment items!!")
+        return
 
     for grid_row in grid_rows:
-        while not attachment_href and retry < config.MAX_RETRIES:
-            attachment_href = find_element_by_xpath(grid_row, ".//a")
-            retry += 1
-            print("Retrying attachment href...")
+        attachment_href = retry_with_backoff(
+            lambda timeout: find_element_by_xpath(grid_row, ".//a", timeout),
+            description="attachment href",
+        )
 
         if not attachment_href:
             continue
@@ -164,7 +375,7 @@ def scrape_attachments(driver):
         )
         attachments_data.append({"url": updated_url, "filename": new_file_name})
 
-        driver.get(updated_url)
+        download_attachment(driver, updated_url, new_file_name)
 
     # Navigate back to details
     click_button_by_xpath(driver, details_tab)
@@ -177,125 +388,158 @@ def get_element_text(element):
         return element.text
 
 
-def scrape_history(driver):
-    results = []
-    dialog_box_xpath = "//div[@role='dialog'][last()]"
-    details_tab_xpath = f"{dialog_box_xpath}//li[@aria-label='Details']"
-    history_xpath = f"{dialog_box_xpath}//li[@aria-label='History']"
-    history_items_xpath = f"{dialog_box_xpath}//div[@class='history-item-summary' or contains(@class, 'history-item-selected')]"
-
-    # Navigate to history tab
-    click_button_by_xpath(driver, history_xpath)
-
-    # Check if there are collapsed history items
-    expand_collapsed_by_xpath(driver)
+def parse_history_item(html):
+    soup = BeautifulSoup(html, "html.parser")
+    username = soup.find("span", {"class": "history-item-name-changed-by"}).text
+    date = soup.find("span", {"class": "history-item-date"}).text
+    summary = soup.find("div", {"class": "history-item-summary-text"}).text
+
+    result = {
+        "User": username,
+        "Date": date,
+        "Title": summary,
+        "Links": [],
+        "Fields": [],
+    }
 
-    retry = 0
-    history_items = None
+    if history_fields := soup.find("div", class_="fields"):
+        fields = history_fields.find_all("div", class_="field-name")
 
-    while retry < config.MAX_RETRIES:
-        history_items = find_elements_by_xpath(driver, history_items_xpath)
+        for field in fields:
+            field_name = field.span.text
+            field_value = field.find_next_sibling("div", class_="field-values")
 
-        if history_items:
-            break
+            new_value = field_value.find("span", class_="field-new-value")
+            old_value = field_value.find("span", class_="field-old-value")
+            result["Fields"].append(
+                {
+                    "name": field_name,
+                    "old_value": get_element_text(old_value),
+                    "new_value": get_element_text(new_value),
+                }
+            )
+    if html_field := soup.find("div", class_="html-field"):
+        field_name = html_field.find("div", {"class": "html-field-name"}).text
+        old_value = html_field.find("div", class_="html-field-old-value-container")
+        new_value = html_field.find("div", class_="html-field-new-value-container")
+
+        result["Fields"].append(
+            {
+                "name": field_name,
+                "old_value": get_element_text(old_value),
+                "new_value": get_element_text(new_value),
+            }
+        )
 
-        if retry == config.MAX_RETRIES:
-            print("Error: Unable to find history items!!")
-            return
+    if added_comment := soup.find("div", {"class": "history-item-comment"}):
+        result["Fields"].append(
+            {
+                "name": "Comments",
+                "old_value": None,
+                "new_value": added_comment.text,
+            }
+        )
 
-        retry += 1
-        print(f"Retrying to find history items... {retry}/{config.MAX_RETRIES}")
+    if editted_comments := soup.find("div", {"class": "history-item-comment-edited"}):
+        old_comment = editted_comments.find("div", class_="old-comment")
+        new_comment = editted_comments.find("div", class_="new-comment")
 
-    for history in history_items:
-        history.click()
+        result["Fields"].append(
+            {
+                "name": "Comments",
+                "old_value": old_comment.text,
+                "new_value": new_comment.text,
+            }
+        )
 
-        details_xpath = f"{dialog_box_xpath}//div[@class='history-item-viewer']"
-        details = find_element_by_xpath(driver, details_xpath)
+    # Get Links
+    if link := soup.find("div", class_="history-links"):
+        display_name = link.find("span", class_="link-display-name").text
+        link = link.find("span", class_="link-text")
 
-        soup = BeautifulSoup(details.get_attribute("innerHTML"), "html.parser")
-        username = soup.find("span", {"class": "history-item-name-changed-by"}).text
-        date = soup.find("span", {"class": "history-item-date"}).text
-        summary = soup.find("div", {"class": "history-item-summary-text"}).text
+        result["Links"].append(
+            {
+                "Type": display_name,
+                "Link to item file": link.a.get("href") if link.a else None,
+                "Title": link.span.text if link.span else None,
+            }
+        )
 
-        result = {
-            "User": username,
-            "Date": date,
-            "Title": summary,
-            "Links": [],
-            "Fields": [],
-        }
+    return result
 
-        if history_fields := soup.find("div", class_="fields"):
-            fields = history_fields.find_all("div", class_="field-name")
-
-            for field in fields:
-                field_name = field.span.text
-                field_value = field.find_next_sibling("div", class_="field-values")
-
-                new_value = field_value.find("span", class_="field-new-value")
-                old_value = field_value.find("span", class_="field-old-value")
-                result["Fields"].append(
-                    {
-                        "name": field_name,
-                        "old_value": get_element_text(old_value),
-                        "new_value": get_element_text(new_value),
-                    }
-                )
-        if html_field := soup.find("div", class_="html-field"):
-            field_name = html_field.find("div", {"class": "html-field-name"}).text
-            old_value = html_field.find("div", class_="html-field-old-value-container")
-            new_value = html_field.find("div", class_="html-field-new-value-container")
 
-            result["Fields"].append(
-                {
-                    "name": field_name,
-                    "old_value": get_element_text(old_value),
-                    "new_value": get_element_text(new_value),
-                }
-            )
+def scrape_history(driver, since_rev=0):
+    """
+    Read the history entries newer than revision since_rev (all by default),
+    newest first, with HISTORY_SCRIPT in as few round trips as the script
+    timeout allows. Returns the entries and the latest revision.
+    """
+    results = []
+    dialog_box_xpath = "//div[@role='dialog'][last()]"
+    details_tab_xpath = f"{dialog_box_xpath}//li[@aria-label='Details']"
+    history_xpath = f"{dialog_box_xpath}//li[@aria-label='History']"
+    history_items_xpath = f"{dialog_box_xpath}//div[@class='history-item-summary' or contains(@class, 'history-item-selected')]"
 
-        if added_comment := soup.find("div", {"class": "history-item-comment"}):
-            result["Fields"].append(
-                {
-                    "name": "Comments",
-                    "old_value": None,
-                    "new_value": added_comment.text,
-                }
-            )
+    # Navigate to history tab
+    click_button_by_xpath(driver, history_xpath)
 
-        if editted_comments := soup.find(
-            "div", {"class": "history-item-comment-edited"}
-        ):
-            old_comment = editted_comments.find("div", class_="old-comment")
-            new_comment = editted_comments.find("div", class_="new-comment")
+    history_items = retry_with_backoff(
+        lambda timeout: find_elements_by_xpath(driver, history_items_xpath, timeout),
+        description="to find history items",
+    )
 
-            result["Fields"].append(
-                {
-                    "name": "Comments",
-                    "old_value": old_comment.text,
-                    "new_value": new_comment.text,
-                }
-            )
+    if not history_items:
+        print("Error: Unable to find history items!!")
+        return None, since_rev
+
+    dialog_box = find_element_by_xpath(driver, dialog_box_xpath)
+    start = 0
+    revision = since_rev
+
+    while start is not None:
+        batch = driver.execute_async_script(
+            HISTORY_SCRIPT,
+            dialog_box,
+            start,
+            since_rev,
+            SCRIPT_BATCH_TIME * 1000,
+            get_script_item_timeout() * 1000,
+        )
 
-        # Get Links
-        if link := soup.find("div", class_="history-links"):
-            display_name = link.find("span", class_="link-display-name").text
-            link = link.find("span", class_="link-text")
+        for html in batch["items"]:
+            if html is None:
+                print("Error: Unable to open history item!!")
+                continue
 
-            result["Links"].append(
-                {
-                    "Type": display_name,
-                    "Link to item file": link.a.get("href") if link.a else None,
-                    "Title": link.span.text if link.span else None,
-                }
-            )
+            results.append(parse_history_item(html))
 
-        results.append(result)
+        start = batch["next"]
+        revision = batch["revision"]
 
     # Navigate back to details tab
     click_button_by_xpath(driver, details_tab_xpath)
 
-    return results
+    return results, revision
+
+
+def read_related_updated_dates(driver, grid_canvas):
+    html = None
+    updated_dates = []
+    start = 0
+
+    while start is not None:
+        batch = driver.execute_async_script(
+            RELATED_UPDATED_SCRIPT,
+            grid_canvas,
+            start,
+            SCRIPT_BATCH_TIME * 1000,
+            get_script_item_timeout() * 1000,
+        )
+        html = html or batch["html"]
+        updated_dates += batch["updated"]
+        start = batch["next"]
+
+    return html, updated_dates
 
 
 def scrape_related_work(driver, dialog_box):
@@ -325,13 +569,8 @@ def scrape_related_work(driver, dialog_box):
     # Click last work item to load all
     related_work_items[-1].click()
 
-    related_work_items = find_elements_by_xpath(dialog_box, related_work_items_xpath)
-    related_work_items_elements = [
-        related_work_item for related_work_item in related_work_items
-    ]
-
-    soup = BeautifulSoup(dialog_box.get_attribute("innerHTML"), "html.parser")
-    soup = soup.find("div", {"class": "grid-canvas"})
+    html, updated_dates = read_related_updated_dates(driver, grid_canvas_container)
+    soup = BeautifulSoup(html, "html.parser")
     related_work_type = None
     related_work_data = {}
     valid_labels = [
@@ -355,24 +594,9 @@ def scrape_related_work(driver, dialog_box):
             related_work_item_id = work_item.get("href").split("/")[-1]
             related_work_title = work_item.get_text().replace(" ", "_")
 
-            updated_date = find_element_by_xpath(
-                related_work_items_elements[index],
-                ".//span[contains(text(), 'Updated')]",
-            )
-
-            if not updated_date:
+            if not (updated_at := updated_dates[index]):
                 continue
 
-            driver.execute_script(
-                "arguments[0].dispatchEvent(new MouseEvent('mouseover', {'bubbles': true}));",
-                updated_date,
-            )
-            updated_at_element = find_element_by_xpath(
-                driver,
-                "(.//div[contains(text(), 'Updated by') and contains(@class, 'popup-content-container')])[last()]",
-            )
-            updated_at = updated_at_element.text
-
             related_work_data[related_work_type].append(
                 {
                     "filename_source": f"{related_work_item_id}_{related_work_title}",
@@ -380,9 +604,6 @@ def scrape_related_work(driver, dialog_box):
                     "updated_at": " ".join(updated_at.split(" ")[-4:]),
                 }
             )
-            driver.execute_script(
-                "arguments[0].parentNode.removeChild(arguments[0]);", updated_at_element
-            )
         else:
             related_work_type = element.find("span").get_text(strip=True)
 
@@ -404,29 +625,15 @@ def scrape_related_work(driver, dialog_box):
 
 
 def scrape_discussion_attachments(driver, attachment, discussion_date):
-    parsed_url = urllib.parse.urlparse(attachment.get("src"))
-    query_params = urllib.parse.parse_qs(parsed_url.query)
-    resource_id = parsed_url.path.split("/")[-1]
-
-    file_name = query_params.get("fileName")
-
-    if not file_name:
+    if not (
+        download := get_discussion_attachment(attachment.get("src"), discussion_date)
+    ):
         return {}
 
-    file_name = file_name[0]
-    new_file_name = f"{convert_date(discussion_date)}_{resource_id}_{file_name}"
-
-    query_params["fileName"] = [new_file_name]
-
-    if "download" not in query_params:
-        query_params["download"] = "True"
+    updated_url, new_file_name = download
+    download_attachment(driver, updated_url, new_file_name)
 
-    updated_url = urllib.parse.urlunparse(
-        parsed_url._replace(query=urllib.parse.urlencode(query_params, doseq=True))
-    )
-    driver.get(updated_url)
-
-    return {"url": updated_url, "filename": query_params["fileName"][0]}
+    return {"url": updated_url, "filename": new_file_name}
 
 
 def scrape_discussions(driver):
@@ -440,6 +647,8 @@ def scrape_discussions(driver):
         "arguments[0].dispatchEvent(new MouseEvent('mouseout', {'bubbles': true}));"
     )
 
+    tooltip_xpath = "//p[contains(@class, 'ms-Tooltip-subtext')]"
+
     discussion_container = find_element_by_xpath(driver, container_xpath)
 
     html = discussion_container.get_attribute("innerHTML")
@@ -448,37 +657,35 @@ def scrape_discussions(driver):
     discussions = soup.find_all("div", class_="comment-item-right")
 
     if discussions:
+        dates = driver.execute_script(DISCUSSION_DATES_SCRIPT, discussion_container)
+
         for index, discussion in enumerate(discussions):
-            index += 1
             username = discussion.find("span", class_="user-display-name").text
             discussion_content = discussion.find("div", class_="comment-content")
             content = convert_to_markdown(discussion_content)
             attachments = discussion.find_all("img")
+            date = dates[index] if index < len(dates) else None
 
-            comment_header_xpath = (
-                f"({container_xpath}//div[@class='comment-header-left'])[{index}]"
-            )
+            # Hover only the comments whose date could not be read in bulk
+            if not date:
+                increment("discussion_date_hovers")
+                comment_header_xpath = f"({container_xpath}//div[@class='comment-header-left'])[{index + 1}]"
 
-            timestamp_xpath = (
-                f"({comment_header_xpath}//*[@class='comment-timestamp'])[1]"
-            )
-            comment_timestamp = find_element_by_xpath(driver, timestamp_xpath)
+                timestamp_xpath = (
+                    f"({comment_header_xpath}//*[@class='comment-timestamp'])[1]"
+                )
+                comment_timestamp = find_element_by_xpath(driver, timestamp_xpath)
 
-            date = None
-            retry_count = 0
-            while date is None and retry_count < config.MAX_RETRIES:
-                driver.execute_script(javascript_command, comment_timestamp)
-                date = get_text(driver, "//p[contains(@class, 'ms-Tooltip-subtext')]")
+                def hover_timestamp(timeout):
+                    driver.execute_script(javascript_command, comment_timestamp)
+                    return get_text(driver, tooltip_xpath, timeout, breaker=False)
+
+                date = retry_with_backoff(
+                    hover_timestamp, description="hover on discussion date"
+                )
 
                 if date:
                     driver.execute_script(mouse_out_command, comment_timestamp)
-                    break
-
-                retry_count += 1
-                print(
-                    f"Retrying hover on discussion date ... {retry_count}/{config.MAX_RETRIES}"
-                )
-                time.sleep(3)
 
             result = {
                 "User": username,
@@ -524,6 +731,32 @@ def scrape_changesets(driver):
     return results
 
 
+def get_development_key(url):
+    # ex. .../_versionControl/changeset/45 or .../_git/<repository>/commit/<hash>
+    parts = urllib.parse.urlparse(url).path.rstrip("/").split("/")
+
+    if len(parts) < 2:
+        return None
+
+    return get_changeset_key(parts[-2].lower(), parts[-1])
+
+
+def scrape_development_link(driver, url):
+    original_window = open_development_tab(driver)
+
+    try:
+        driver.get(url)
+        change_sets = scrape_changesets(driver)
+
+        return {
+            "ID": driver.current_url.split("/")[-1],
+            "Title": driver.title,
+            "change_sets": change_sets,
+        }
+    finally:
+        driver.switch_to.window(original_window)
+
+
 def scrape_development(driver):
     results = []
     dialog_box = "//div[@role='dialog'][last()]"
@@ -535,7 +768,6 @@ def scrape_development(driver):
         driver, f"{dialog_box}{development_section}//div[@class='la-item']"
     )
 
-    original_window = driver.current_window_handle
     print("Development items", development_items)
 
     failed_texts = [
@@ -545,27 +777,20 @@ def scrape_development(driver):
 
     if development_items:
         for development_item in development_items:
-            failed = [get_text(development_item, text) for text in failed_texts]
-
-            if failed:
+            # Already rendered, so failure texts are looked up without waiting
+            if any(
+                development_item.find_elements(By.XPATH, text) for text in failed_texts
+            ):
                 continue
 
-            click_button_by_xpath(development_item, ".//a")
+            if not (links := development_item.find_elements(By.XPATH, ".//a")):
+                continue
 
-            WebDriverWait(driver, config.MAX_WAIT_TIME).until(
-                EC.number_of_windows_to_be(2)
+            url = links[0].get_attribute("href")
+            result = get_cached_changeset(
+                get_development_key(url), lambda: scrape_development_link(driver, url)
             )
-
-            driver.switch_to.window(driver.window_handles[-1])
-            result = {
-                "ID": driver.current_url.split("/")[-1],
-                "Title": driver.title,
-                "change_sets": scrape_changesets(driver),
-            }
             results.append(result)
-
-            driver.close()
-            driver.switch_to.window(original_window)
     return results
 
 
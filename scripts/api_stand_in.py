@@ -0,0 +1,211 @@
+"""
+REST API stand-in
+=================
+
+Serves a small Azure DevOps REST API fixture: an epic with a child, a related
+work item, an attachment, a comment with an inline image, one history update
+and a TFVC changeset. The REST source can be run against it without a
+Personal Access Token or network, ex. to check section selection or
+incremental runs end to end.
+
+Run from the repository root:
+    python -m scripts.api_stand_in --port 8765
+
+and in another shell:
+    scrape_source=api api_base_url=http://127.0.0.1:8765/_apis \
+    base_url=https://dev.azure.com/org/project/x personal_access_token=x \
+    python main.py --sections history,development
+"""
+
+import argparse
+import json
+import threading
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+CHANGED_DATE = "2023-03-12T10:11:12Z"
+
+
+def make_work_item(base_url, work_item_id, title, child_ids=(), relations=()):
+    return {
+        "id": work_item_id,
+        "fields": {
+            "System.Id": work_item_id,
+            "System.Title": title,
+            "System.State": "New",
+            "System.AreaPath": "Project",
+            "System.IterationPath": "Project\\Sprint 1",
+            "System.WorkItemType": "Epic",
+            "System.AssignedTo": {"displayName": "Jane Doe"},
+            "System.ChangedDate": CHANGED_DATE,
+            "System.Rev": 2,
+            "Microsoft.VSTS.Common.Priority": 2,
+            "System.Description": "<div>Fixture <a href='#'>link</a></div>"
+            "<ul><li>item</li></ul>",
+        },
+        "relations": [
+            {
+                "rel": "System.LinkTypes.Hierarchy-Forward",
+                "url": f"{base_url}/wit/workItems/{child_id}",
+            }
+            for child_id in child_ids
+        ]
+        + list(relations),
+    }
+
+
+def make_work_items(base_url):
+    relations = [
+        {
+            "rel": "AttachedFile",
+            "url": f"{base_url}/wit/attachments/abc",
+            "attributes": {"name": "notes.txt", "resourceCreatedDate": CHANGED_DATE},
+        },
+        {
+            "rel": "ArtifactLink",
+            "url": "vstfs:///VersionControl/Changeset/7",
+            "attributes": {"name": "Fixed in Changeset"},
+        },
+        {"rel": "System.LinkTypes.Related", "url": f"{base_url}/wit/workItems/9"},
+    ]
+
+    return {
+        1: make_work_item(base_url, 1, "Epic one", [2], relations),
+        2: make_work_item(base_url, 2, "Child two"),
+        9: make_work_item(base_url, 9, "Other"),
+    }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def __init__(self, base_url, *args, **kwargs):
+        self.base_url = base_url
+        self.work_items = make_work_items(base_url)
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        path = urlparse(self.path).path
+
+        if path.endswith("/wiql"):
+            return self.send({"workItems": [{"id": 1}]})
+
+        if path.endswith("/workitemsbatch"):
+            return self.send(
+                {
+                    "value": [
+                        self.work_items[work_item_id]
+                        for work_item_id in body["ids"]
+                        if work_item_id in self.work_items
+                    ]
+                }
+            )
+
+        self.send_error(404)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+
+        if path.endswith("/wit/fields"):
+            return self.send(
+                {"value": [{"referenceName": "System.State", "name": "State"}]}
+            )
+
+        if path.endswith("/comments"):
+            image = f"{self.base_url}/wit/attachments/img1?fileName=screen.png"
+            return self.send(
+                {
+                    "comments": [
+                        {
+                            "text": f"<p>Looks good</p><img src='{image}'>",
+                            "createdBy": {"displayName": "Jane Doe"},
+                            "createdDate": CHANGED_DATE,
+                        }
+                    ]
+                }
+            )
+
+        if path.endswith("/updates"):
+            return self.send(
+                {
+                    "value": [
+                        {
+                            "revisedBy": {"displayName": "Jane Doe"},
+                            "revisedDate": CHANGED_DATE,
+                            "fields": {
+                                "System.State": {
+                                    "oldValue": "New",
+                                    "newValue": "Active",
+                                },
+                                "System.History": {"newValue": "<p>Started</p>"},
+                            },
+                            "relations": {
+                                "added": [
+                                    {
+                                        "rel": "System.LinkTypes.Related",
+                                        "url": f"{self.base_url}/wit/workItems/9",
+                                    }
+                                ]
+                            },
+                        }
+                    ]
+                }
+            )
+
+        if "/attachments/" in path:
+            return self.send(b"DATA", "application/octet-stream")
+
+        if path.endswith("/changesets/7"):
+            return self.send({"comment": "Fix the fixture"})
+
+        if path.endswith("/changesets/7/changes"):
+            return self.send({"value": [{"item": {"path": "$/Project/src/app.py"}}]})
+
+        if path.endswith("/tfvc/items"):
+            return self.send(b"print('fixture')", "text/plain")
+
+        self.send_error(404)
+
+
+def start_stand_in(port=0):
+    """
+    Serve the fixture from a background thread, on a free port by default,
+    returning the server and its API base URL.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), BaseHTTPRequestHandler)
+    base_url = f"http://127.0.0.1:{server.server_port}/_apis"
+    server.RequestHandlerClass = partial(StandInHandler, base_url)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a REST API fixture.")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server, base_url = start_stand_in(args.port)
+    print(f"Serving the REST API stand-in at {base_url}")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Markdown conversion benchmark
+=============================
+
+Converts the large description and comment fixtures with the previous
+multi-pass converter and the current single pass converter, checks both
+produce the same markdown and reports the median time of each, plus the time
+of a memoized html_to_markdown() call.
+
+Run from the repository root:
+    python -m scripts.benchmark_markdown --runs 5
+"""
+
+import argparse
+import statistics
+import string
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from action_utils import convert_to_markdown, get_roman_numeral, html_to_markdown
+
+FIXTURE_DIRECTORY = Path(__file__).parent / "fixtures" / "markdown"
+
+
+def legacy_convert_links(soup):
+    for link in soup.find_all("a"):
+        link.replace_with(f"[{link.text}]({link.get('href')})")
+    return soup
+
+
+def legacy_convert_to_markdown(soup):
+    for div in soup.find_all("div"):
+        div.insert_after("\n")
+
+    for ul in soup.find_all("ul"):
+        markdown_ul = ""
+        for li in ul.find_all("li"):
+            li = legacy_convert_links(li)
+            indentation = "  " * (len(li.find_parents("ul")) - 1)
+            markdown_ul += f"{indentation}* {li.text}\n"
+        ul.replace_with(markdown_ul)
+
+    prev_indentation_level = None
+    last_occurrence_index = -1
+    last_occurrence_indentation = False
+
+    for ol in soup.find_all("ol"):
+        markdown_ol = ""
+        index = 0
+        letters = 0
+        roman_numerals = 0
+
+        for li in ol.find_all("li"):
+            li = legacy_convert_links(li)
+            indentation_level = len(li.find_parents("ol")) - 1
+            indentation = "  " * indentation_level
+
+            if indentation_level != prev_indentation_level:
+                if prev_indentation_level == 1:
+                    last_occurrence_index = len(markdown_ol) - 1
+                    last_occurrence_indentation = True
+                prev_indentation_level = indentation_level
+
+            if indentation_level == 0:
+                index += 1
+                markdown_ol += f"{indentation}{index}. {li.text}\n"
+            elif indentation_level == 1:
+                if letters == 0:
+                    markdown_ol = markdown_ol.rstrip("\n") + "\\\n"
+                letters += 1
+                letter = string.ascii_lowercase[letters - 1]
+                markdown_ol += f"{indentation}{letter}. {li.text}\\\n"
+            elif indentation_level == 2:
+                if roman_numerals == 0:
+                    markdown_ol += "\\\n"
+                roman_numerals += 1
+                markdown_ol += f"{indentation}{get_roman_numeral(index)}. {li.text}\\\n"
+
+        if last_occurrence_indentation:
+            markdown_ol = (
+                markdown_ol[:last_occurrence_index].rstrip("\\\n")
+                + markdown_ol[last_occurrence_index:]
+            )
+
+        ol.replace_with(markdown_ol)
+
+    legacy_convert_links(soup)
+
+    return soup.get_text().rstrip()
+
+
+def measure(convert, html, runs):
+    timings = []
+
+    for _ in range(runs):
+        soup = BeautifulSoup(html, "html.parser")
+        start = time.perf_counter()
+        markdown = convert(soup)
+        timings.append(time.perf_counter() - start)
+
+    return statistics.median(timings), markdown
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark markdown conversion.")
+    parser.add_argument("--runs", type=int, default=5, help="Conversions per fixture")
+    args = parser.parse_args()
+
+    print(
+        f"{'fixture':<22}{'legacy (ms)':>14}{'single pass (ms)':>18}{'memoized (ms)':>16}"
+    )
+    for fixture in sorted(FIXTURE_DIRECTORY.glob("*.html")):
+        html = fixture.read_text(encoding="utf-8")
+        legacy_time, legacy_markdown = measure(
+            legacy_convert_to_markdown, html, args.runs
+        )
+        current_time, current_markdown = measure(convert_to_markdown, html, args.runs)
+
+        if current_markdown != legacy_markdown:
+            raise RuntimeError(f"{fixture.name}: converters produce different output")
+
+        html_to_markdown(html)
+        start = time.perf_counter()
+        html_to_markdown(html)
+        memoized_time = time.perf_counter() - start
+
+        print(
+            f"{fixture.name:<22}{legacy_time * 1000:>14.1f}"
+            f"{current_time * 1000:>18.1f}{memoized_time * 1000:>16.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
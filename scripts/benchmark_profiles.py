@@ -0,0 +1,128 @@
+"""
+Browser profile benchmark
+=========================
+
+Serves a local backlog fixture, where fonts, avatars, static images and
+telemetry respond slowly, and compares page load and dialog open latency of
+the default and fast browser profiles.
+
+Run from the repository root:
+    python -m scripts.benchmark_profiles --runs 5
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.wait import WebDriverWait
+
+from driver_utils import chrome_settings_init, configure_driver
+from main import TOP_LEVEL_XPATH
+
+FIXTURE_DIRECTORY = Path(__file__).parent / "fixtures"
+SLOW_PATHS = ("/fonts/", "/_static/", "/_apis/GraphProfile/", "/browser.events")
+DIALOG_XPATH = "//div[@role='dialog'][last()]"
+TITLE_XPATH = f"{DIALOG_XPATH}//input[@aria-label='Title Field']"
+WAIT_TIME = 30
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    asset_delay = 0.2
+
+    def do_GET(self):
+        if self.path.startswith(SLOW_PATHS):
+            time.sleep(self.asset_delay)
+            self.send_bytes(b"", "application/octet-stream")
+        elif self.path.startswith("/_apis/wit/workitems/"):
+            self.send_bytes(b"{}", "application/json")
+        else:
+            self.path = "/backlog.html"
+            super().do_GET()
+
+    def send_bytes(self, body, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fixture_server(asset_delay):
+    FixtureHandler.asset_delay = asset_delay
+    handler = partial(FixtureHandler, directory=str(FIXTURE_DIRECTORY))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def measure_profile(profile, url, dialogs):
+    chrome_config, download_directory = chrome_settings_init("benchmark", profile)
+
+    with webdriver.Chrome(**chrome_config) as driver:
+        configure_driver(driver, download_directory, profile)
+        wait = WebDriverWait(driver, WAIT_TIME)
+
+        start = time.perf_counter()
+        driver.get(url)
+        wait.until(EC.presence_of_all_elements_located((By.XPATH, TOP_LEVEL_XPATH)))
+        page_load = time.perf_counter() - start
+
+        dialog_opens = []
+        for index in range(dialogs):
+            row = driver.find_elements(By.XPATH, TOP_LEVEL_XPATH)[index]
+
+            start = time.perf_counter()
+            row.find_element(By.XPATH, ".//a").click()
+            wait.until(EC.presence_of_element_located((By.XPATH, TITLE_XPATH)))
+            dialog_opens.append(time.perf_counter() - start)
+
+            driver.find_element(By.XPATH, f"{DIALOG_XPATH}//button").click()
+            wait.until(EC.invisibility_of_element_located((By.XPATH, DIALOG_XPATH)))
+
+    return page_load, statistics.median(dialog_opens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare browser profile latency.")
+    parser.add_argument(
+        "--runs", type=int, default=3, help="Browser launches per profile"
+    )
+    parser.add_argument("--dialogs", type=int, default=5, help="Dialogs opened per run")
+    parser.add_argument(
+        "--asset-delay",
+        type=float,
+        default=0.2,
+        help="Seconds the fixture waits before serving fonts, avatars and images",
+    )
+    args = parser.parse_args()
+
+    server = start_fixture_server(args.asset_delay)
+    url = f"http://127.0.0.1:{server.server_port}/"
+
+    print(f"{'profile':<10}{'page load (ms)':>16}{'dialog open (ms)':>18}")
+    for profile in ("default", "fast"):
+        page_loads, dialog_opens = zip(
+            *[measure_profile(profile, url, args.dialogs) for _ in range(args.runs)]
+        )
+        print(
+            f"{profile:<10}"
+            f"{statistics.median(page_loads) * 1000:>16.0f}"
+            f"{statistics.median(dialog_opens) * 1000:>18.0f}"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Offline benchmark suite
+=======================
+
+Times the parsing and post processing hot paths without a browser, using the
+saved fixtures and synthetic work item trees, and stores the results as JSON
+so runs can be compared over time:
+    * parse_basic_fields on a dialog snapshot
+    * parse_history_item on history entries
+    * convert_to_markdown on the markdown fixtures
+    * convert_date on the formats found in scraped data
+    * create_directory_hierarchy and create_related_work_contents on
+      synthetic trees of 1k, 10k and 100k work items
+
+Run from the repository root:
+    python -m scripts.benchmark_suite
+    python -m scripts.benchmark_suite --sizes 1000 --compare data/benchmarks/old.json
+"""
+
+import argparse
+import collections
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+import action_utils
+import config
+from action_utils import convert_date, convert_to_markdown
+from results_processor import create_directory_hierarchy, create_related_work_contents
+from scrape_utils import parse_basic_fields, parse_history_item
+
+FIXTURE_DIRECTORY = Path(__file__).parent / "fixtures"
+OUTPUT_DIRECTORY = Path("data", "benchmarks")
+TREE_FANOUT = 10
+
+
+def summarize(name, timings, items=1):
+    median = statistics.median(timings)
+    print(f"{name:<50}{median * 1000:>12.2f} ms{items / median:>14.0f} items/s")
+
+    return {
+        "name": name,
+        "runs": len(timings),
+        "items": items,
+        "median_s": median,
+        "min_s": min(timings),
+    }
+
+
+def measure(name, operation, runs, items=1, setup=None):
+    timings = []
+
+    for _ in range(runs):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        operation(argument)
+        timings.append(time.perf_counter() - start)
+
+    return summarize(name, timings, items)
+
+
+def benchmark_basic_fields(runs, repeat=200):
+    snapshot = json.loads((FIXTURE_DIRECTORY / "dialog_snapshot.json").read_text())
+
+    def parse(_):
+        for _ in range(repeat):
+            action_utils.html_to_markdown.cache_clear()
+            parse_basic_fields(snapshot)
+
+    return [measure("parse_basic_fields", parse, runs, repeat)]
+
+
+def make_history_items(count):
+    fixtures = json.loads((FIXTURE_DIRECTORY / "history_items.json").read_text())
+    return [
+        fixtures[index % len(fixtures)].replace("Jane Doe", f"User {index % 37}")
+        for index in range(count)
+    ]
+
+
+def benchmark_history(runs, count=1000):
+    history_items = make_history_items(count)
+
+    def parse(_):
+        for html in history_items:
+            parse_history_item(html)
+
+    return [measure("parse_history_item", parse, runs, count)]
+
+
+def benchmark_markdown(runs):
+    results = []
+
+    for fixture in sorted((FIXTURE_DIRECTORY / "markdown").glob("*.html")):
+        html = fixture.read_text(encoding="utf-8")
+        results.append(
+            measure(
+                f"convert_to_markdown[{fixture.stem}]",
+                convert_to_markdown,
+                runs,
+                setup=lambda: BeautifulSoup(html, "html.parser"),
+            )
+        )
+
+    return results
+
+
+def make_dates(count, date_format):
+    start = datetime(2023, 1, 1)
+    return [
+        (start + timedelta(minutes=17 * index)).strftime(date_format)
+        for index in range(count)
+    ]
+
+
+def benchmark_convert_date(runs, count=10000):
+    cases = [
+        ("discussion", make_dates(count, "%d %B %Y %H:%M:%S"), {}),
+        (
+            "history",
+            make_dates(count, "%a %d/%m/%Y %H:%M"),
+            {"date_format": "%a %d/%m/%Y %H:%M"},
+        ),
+        # Formats which miss strptime fall back to the fuzzy dateutil parser
+        ("fuzzy", make_dates(count, "%A, %B %d, %Y at %I:%M %p"), {}),
+    ]
+    results = []
+
+    for name, dates, arguments in cases:
+
+        def convert(_, dates=dates, arguments=arguments):
+            for date in dates:
+                convert_date(date, **arguments)
+
+        results.append(measure(f"convert_date[{name}]", convert, runs, count))
+
+    return results
+
+
+def make_work_item(task_id, size, rng):
+    related_id = rng.randint(1, size)
+    return {
+        "Task id": str(task_id),
+        "Title": f"Work item {task_id}",
+        "User Name": f"User {task_id % 37}",
+        "State": rng.choice(["New", "Active", "Resolved", "Closed"]),
+        "Area": "Project\\Exports",
+        "Iteration": f"Project\\Sprint {task_id % 20}",
+        "Priority": str(task_id % 4 + 1),
+        "description": f"* Description\n\t* Synthetic work item {task_id}\n",
+        "history": [
+            {
+                "User": f"User {task_id % 37}",
+                "Date": "Tue 14/03/2023 10:42",
+                "Title": "Changed State",
+                "Fields": [
+                    {"name": "State", "old_value": "New", "new_value": "Active"}
+                ],
+                "Links": [],
+            }
+        ],
+        "discussions": [
+            {
+                "User": f"User {task_id % 11}",
+                "Date": "14 March 2023 10:42:00",
+                "Content": "Synthetic comment " * 10,
+                "attachments": [],
+            }
+        ],
+        "attachments": [],
+        "development": [],
+        "related_work": [
+            {
+                "type": "Related",
+                "related_work_items": [
+                    {
+                        "link_target": f"{related_id}_Work_item_{related_id}",
+                        "filename_source": f"{related_id}_Work_item_{related_id}",
+                        "updated_at": "14 March 2023 10:42:00",
+                    }
+                ],
+            }
+        ],
+        "children": [],
+    }
+
+
+def make_work_item_tree(size, seed=0):
+    rng = random.Random(seed)
+    top_level = [
+        make_work_item(task_id, size, rng)
+        for task_id in range(1, max(size // 1000, 1) + 1)
+    ]
+    parents = collections.deque(top_level)
+    task_id = len(top_level)
+
+    # Fill the tree breadth first, TREE_FANOUT children per work item
+    while task_id < size:
+        parent = parents.popleft()
+        for _ in range(min(TREE_FANOUT, size - task_id)):
+            task_id += 1
+            child = make_work_item(task_id, size, rng)
+            parent["children"].append(child)
+            parents.append(child)
+
+    return top_level
+
+
+def benchmark_tree(size, runs):
+    tree = make_work_item_tree(size)
+    hierarchy_timings = []
+    related_timings = []
+
+    for _ in range(runs):
+        work_items = copy.deepcopy(tree)
+        index = {}
+
+        with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(
+            io.StringIO()
+        ):
+            path = Path(directory)
+            start = time.perf_counter()
+            create_directory_hierarchy(
+                work_items, path, Path(path, "attachments"), 0, index
+            )
+            hierarchy_timings.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            create_related_work_contents(work_items, path, index)
+            related_timings.append(time.perf_counter() - start)
+
+    return [
+        summarize(f"create_directory_hierarchy[{size}]", hierarchy_timings, size),
+        summarize(f"create_related_work_contents[{size}]", related_timings, size),
+    ]
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous_file):
+    previous = {
+        result["name"]: result
+        for result in json.loads(Path(previous_file).read_text())["results"]
+    }
+
+    print(f"\n{'benchmark':<50}{'previous':>12}{'current':>12}{'change':>10}")
+    for result in results:
+        if old := previous.get(result["name"]):
+            change = result["median_s"] / old["median_s"] - 1
+            print(
+                f"{result['name']:<50}{old['median_s'] * 1000:>10.2f}ms"
+                f"{result['median_s'] * 1000:>10.2f}ms{change:>+10.1%}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per benchmark")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Work item counts of the synthetic trees",
+    )
+    parser.add_argument(
+        "--tree-runs", type=int, default=1, help="Runs per synthetic tree size"
+    )
+    parser.add_argument("--output", help="Results file, defaults to data/benchmarks")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args()
+
+    config.BASE_URL = config.BASE_URL or "https://dev.azure.com/org/project"
+
+    results = []
+    results += benchmark_basic_fields(args.runs)
+    results += benchmark_history(args.runs)
+    results += benchmark_markdown(args.runs)
+    results += benchmark_convert_date(args.runs)
+    for size in args.sizes:
+        results += benchmark_tree(size, args.tree_runs)
+
+    created = datetime.now(timezone.utc)
+    output = Path(
+        args.output
+        or Path(OUTPUT_DIRECTORY, f"{created.strftime('%Y_%m_%dT%H_%M_%S')}.json")
+    )
+    os.makedirs(output.parent, exist_ok=True)
+    output.write_text(
+        json.dumps(
+            {
+                "created": created.isoformat(),
+                "commit": get_commit(),
+                "python": sys.version,
+                "platform": platform.platform(),
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    print(f"\nSaved results to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
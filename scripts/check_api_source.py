@@ -0,0 +1,118 @@
+"""
+REST source check
+=================
+
+Runs api_scraper() and post_process_results() against the REST API stand-in
+in a temporary directory and checks the scraped fields and written folders.
+Exits with status 1 listing the failed checks.
+
+Run from the repository root:
+    python -m scripts.check_api_source
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import config
+from api_utils import api_scraper
+from jsonl_utils import read_results
+from main import save_result
+from results_processor import post_process_results
+from scripts.api_stand_in import start_stand_in
+
+EXPECTED_PATHS = [
+    "1_Epic_one/description.md",
+    "1_Epic_one/metadata.md",
+    "1_Epic_one/attachments/2023_03_12T10_11_12_abc_notes.txt",
+    "1_Epic_one/development/changeset_7.md",
+    "1_Epic_one/2_Child_two/metadata.md",
+]
+
+
+def check_results(results):
+    failures = []
+
+    if [result["Task id"] for result in results] != ["1"]:
+        failures.append(f"expected one top level work item 1, got {results}")
+        return failures
+
+    epic = results[0]
+    expected = {
+        "Title": "Epic_one",
+        "State": "New",
+        "User Name": "Jane Doe",
+        "children": ["2"],
+        "discussions": ["Jane Doe"],
+        "history": ["Jane Doe"],
+        "development": ["7"],
+    }
+    actual = {
+        "Title": epic.get("Title"),
+        "State": epic.get("State"),
+        "User Name": epic.get("User Name"),
+        "children": [child["Task id"] for child in epic.get("children", [])],
+        "discussions": [comment["User"] for comment in epic.get("discussions", [])],
+        "history": [item["User"] for item in epic.get("history", [])],
+        "development": [str(item["ID"]) for item in epic.get("development", [])],
+    }
+
+    for key, value in expected.items():
+        if actual[key] != value:
+            failures.append(f"{key}: expected {value}, got {actual[key]}")
+
+    return failures
+
+
+def main():
+    server, base_url = start_stand_in()
+    os.chdir(tempfile.mkdtemp(prefix="api-source-check-"))
+
+    config.API_BASE_URL = base_url
+    config.BASE_URL = "https://dev.azure.com/org/project/board"
+    result_file = str(Path("data", "scrape_result.jsonl"))
+    downloads_directory = Path(os.getcwd(), "data", "attachments")
+
+    try:
+        api_scraper(
+            config.BASE_URL, "token", result_file, downloads_directory, save_result
+        )
+        failures = check_results(list(read_results(result_file)))
+
+        # The tree saved above is completed in the checkpoint, nothing is redone
+        resumed = []
+        api_scraper(
+            config.BASE_URL,
+            "token",
+            result_file,
+            downloads_directory,
+            lambda *args: resumed.append(args),
+            resume=True,
+        )
+        if resumed:
+            failures.append(f"--resume saved {len(resumed)} completed trees again")
+        if not Path(result_file).exists():
+            failures.append("--resume removed the result file")
+        elif (count := len(list(read_results(result_file)))) != 1:
+            failures.append(f"--resume: expected 1 work item tree, got {count}")
+
+        post_process_results(result_file, downloads_directory)
+    finally:
+        server.shutdown()
+
+    failures += [
+        f"missing {path}" for path in EXPECTED_PATHS if not Path("data", path).exists()
+    ]
+
+    for failure in failures:
+        print(f"FAILED {failure}")
+
+    if failures:
+        sys.exit(1)
+
+    print(f"REST source check passed in {os.getcwd()}")
+
+
+if __name__ == "__main__":
+    main()
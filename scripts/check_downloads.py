@@ -0,0 +1,85 @@
+"""
+Download check
+==============
+
+Runs download_file() against the download stand-in in a temporary directory:
+a plain download, a dropped connection resumed with Range, a leftover
+complete part file answered with 416, a checksum mismatch recovered by
+starting over and downloads which never match their checksum or size.
+Exits with status 1 listing the failed checks.
+
+Run from the repository root:
+    python -m scripts.check_downloads
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+from download_utils import DOWNLOAD_RETRIES, create_download_session, download_file
+from scripts.download_stand_in import CONTENT, start_stand_in
+
+
+def check_download(session, base_url, directory, path, expected_size=None):
+    destination = Path(directory, path.strip("/"))
+    downloaded = download_file(
+        session, f"{base_url}{path}", destination, expected_size=expected_size
+    )
+    content = destination.read_bytes() if destination.exists() else None
+    part_left = destination.with_name(f"{destination.name}.part").exists()
+
+    return downloaded, content, part_left
+
+
+def main():
+    server, base_url, requests = start_stand_in()
+    session = create_download_session()
+    directory = tempfile.mkdtemp(prefix="download-check-")
+    failures = []
+
+    def expect(name, condition):
+        if not condition:
+            failures.append(name)
+
+    try:
+        downloaded, content, _ = check_download(session, base_url, directory, "/file")
+        expect("plain download", downloaded and content == CONTENT)
+
+        downloaded, content, _ = check_download(session, base_url, directory, "/drop")
+        expect("dropped download is resumed", downloaded and content == CONTENT)
+        expect("resume asks for a Range", requests["/drop range"] == 1)
+
+        # A complete part file left by an interrupted run
+        Path(directory, "complete.part").write_bytes(CONTENT)
+        downloaded, content, part_left = check_download(
+            session, base_url, directory, "/file?complete", len(CONTENT)
+        )
+        expect("416 completes a full part file", downloaded and content == CONTENT)
+        expect("416 leaves no part file", not part_left)
+
+        downloaded, content, _ = check_download(
+            session, base_url, directory, "/corrupt-once"
+        )
+        expect("checksum mismatch starts over", downloaded and content == CONTENT)
+
+        for path, expected_size in [("/mismatch", None), ("/short", len(CONTENT))]:
+            downloaded, content, part_left = check_download(
+                session, base_url, directory, path, expected_size
+            )
+            expect(f"{path} is rejected", not downloaded and content is None)
+            expect(f"{path} leaves no part file", not part_left)
+            expect(f"{path} is retried", requests[path] == DOWNLOAD_RETRIES)
+    finally:
+        server.shutdown()
+
+    for failure in failures:
+        print(f"FAILED {failure}")
+
+    if failures:
+        sys.exit(1)
+
+    print(f"Download check passed in {directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Download stand-in
+=================
+
+Serves attachment downloads which misbehave the way slow or flaky servers do,
+to check download_utils without a browser or network:
+    /file          the attachment, with Content-MD5 and Range support
+    /drop          closes the first response halfway, later ones honour Range
+    /corrupt-once  sends damaged bytes with the right Content-MD5 once
+    /mismatch      always sends damaged bytes with the right Content-MD5
+    /short         always sends fewer bytes than the work item lists
+
+A Range starting at or past the end of the attachment gets 416.
+
+Run from the repository root:
+    python -m scripts.download_stand_in --port 8766
+"""
+
+import argparse
+import base64
+import hashlib
+import re
+import threading
+from collections import Counter
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT = bytes(range(256)) * 1024
+CONTENT_MD5 = base64.b64encode(hashlib.md5(CONTENT).digest()).decode()
+
+
+class DownloadHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, requests, *args, **kwargs):
+        # Requests seen per path and whether they asked for a Range
+        self.requests = requests
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+    def get_offset(self):
+        if match := re.match(r"bytes=(\d+)-", self.headers.get("Range", "")):
+            return int(match.group(1))
+
+        return 0
+
+    def send_content(self, body, offset=0, content_md5=CONTENT_MD5, length=None):
+        if offset >= len(CONTENT):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(CONTENT)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = body[offset:]
+        self.send_response(206 if offset else 200)
+        self.send_header("Content-Length", str(len(body) if length is None else length))
+
+        if offset:
+            self.send_header(
+                "Content-Range", f"bytes {offset}-{len(CONTENT) - 1}/{len(CONTENT)}"
+            )
+        elif content_md5:
+            self.send_header("Content-MD5", content_md5)
+
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        offset = self.get_offset()
+
+        with self.server.lock:
+            self.requests[path] += 1
+            self.requests[f"{path} range"] += bool(offset)
+            count = self.requests[path]
+
+        damaged = bytes(len(CONTENT))
+
+        if path == "/file":
+            self.send_content(CONTENT, offset)
+        elif path == "/drop":
+            if count == 1:
+                # Announce the whole attachment, then hang up halfway
+                self.send_content(CONTENT[: len(CONTENT) // 2], length=len(CONTENT))
+                self.close_connection = True
+            else:
+                self.send_content(CONTENT, offset)
+        elif path == "/corrupt-once":
+            self.send_content(damaged if count == 1 else CONTENT, offset)
+        elif path == "/mismatch":
+            self.send_content(damaged, offset)
+        elif path == "/short":
+            self.send_content(CONTENT[:-1], offset, content_md5=None)
+        else:
+            self.send_error(404)
+
+
+def start_stand_in(port=0):
+    """
+    Serve the downloads from a background thread, on a free port by default,
+    returning the server, its base URL and the request counts per path.
+    """
+    requests = Counter()
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", port), partial(DownloadHandler, requests)
+    )
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, f"http://127.0.0.1:{server.server_port}", requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve misbehaving downloads.")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    server, base_url, _ = start_stand_in(args.port)
+    print(f"Serving the download stand-in at {base_url}")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Offline replay
+==============
+
+Runs scraper() and post_process_results() against a WebDriver recording made
+with main.py --record, without a browser or network, and optionally checks
+the replayed results against the ones saved by the recorded run. Everything
+is written below the output directory. Attachments are not part of the
+recording, so they are reported as not downloaded.
+
+Run from the repository root:
+    python main.py --record data/recording.jsonl.gz
+    python -m scripts.replay data/recording.jsonl.gz --expected data/scrape_result.jsonl
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+from pathlib import Path
+
+import config
+from download_utils import register_driver
+from jsonl_utils import read_results
+from main import scraper
+from metrics_utils import save_metrics, span
+from profiler_utils import profile_driver, report_profile
+from replay_utils import create_replay_driver, virtual_clock
+from results_processor import post_process_results
+
+# Output files kept below the output directory whatever the configured path,
+# the default relative checkpoint, fingerprint and manifest paths already are
+OUTPUT_SETTINGS = ["RESULT_FILE", "BLOB_STORE", "METRICS_FILE", "PROMETHEUS_FILE"]
+
+
+def configure_replay():
+    for name in OUTPUT_SETTINGS:
+        if value := getattr(config, name):
+            setattr(config, name, str(Path("data", Path(value).name)))
+
+    # Same settings as the recorded run, downloads are never received
+    config.HTTP_DOWNLOADS = False
+    config.WATCH_DOWNLOADS = False
+    config.SESSION_FILE = ""
+    # Typed keys are redacted in recordings, any value replays the login
+    config.EMAIL = config.EMAIL or "replay"
+    config.PASSWORD = config.PASSWORD or "replay"
+
+
+def compare_results(actual_file, expected_file):
+    mismatches = 0
+
+    for index, (actual, expected) in enumerate(
+        itertools.zip_longest(read_results(actual_file), read_results(expected_file))
+    ):
+        if actual != expected:
+            task_id = (expected or actual).get("Task id")
+            print(f"Work item {index} (Task id {task_id}) differs from the recording")
+            mismatches += 1
+
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded scrape offline.")
+    parser.add_argument("recording", help="File saved with main.py --record")
+    parser.add_argument(
+        "--output-directory",
+        default=str(Path("data", "replay")),
+        help="Directory the replayed scrape writes its data folder to",
+    )
+    parser.add_argument("--expected", help="Results of the recorded run to compare")
+    args = parser.parse_args()
+
+    recording = Path(args.recording).resolve()
+    expected = Path(args.expected).resolve() if args.expected else None
+
+    os.makedirs(args.output_directory, exist_ok=True)
+    os.chdir(args.output_directory)
+    configure_replay()
+    downloads_directory = Path(os.getcwd(), "data", "attachments")
+    os.makedirs(downloads_directory, exist_ok=True)
+
+    start = time.perf_counter()
+    with virtual_clock():
+        driver = create_replay_driver(recording)
+        if config.PROFILE_WEBDRIVER:
+            profile_driver(driver)
+
+        register_driver(driver, downloads_directory)
+        scraper(
+            driver, config.BASE_URL, config.EMAIL, config.PASSWORD, config.RESULT_FILE
+        )
+        progress = driver.command_executor.get_progress()
+        driver.quit()
+
+    scrape_time = time.perf_counter() - start
+    print(
+        f"Replayed {progress['replayed']} of {progress['recorded']} commands "
+        f"({progress['skipped']} skipped) in {scrape_time:.2f}s"
+    )
+
+    with span("post_process"):
+        post_process_results(config.RESULT_FILE, downloads_directory)
+
+    save_metrics()
+    report_profile()
+
+    if expected and (mismatches := compare_results(config.RESULT_FILE, expected)):
+        print(f"{mismatches} work items differ from the recorded run")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
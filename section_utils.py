@@ -0,0 +1,73 @@
+"""
+Work item section selection
+
+SECTIONS (or main.py --sections) lists the sections scraped besides the
+basic fields and description, ex. "history" or "none" for a metadata only
+export. Sections which are not selected are never navigated to, are counted
+as skipped in the run metrics and are left out by post processing.
+"""
+
+import config
+from metrics_utils import increment, span
+
+SECTIONS = ["discussions", "related_work", "development", "history", "attachments"]
+
+
+def parse_sections(value):
+    value = (value or "").strip().lower()
+
+    if value == "all":
+        return list(SECTIONS)
+
+    if value in ("", "none"):
+        return []
+
+    sections = [section.strip() for section in value.split(",") if section.strip()]
+    if unknown := set(sections) - set(SECTIONS):
+        raise ValueError(
+            f"Unknown sections {', '.join(sorted(unknown))}, "
+            f"choose from {', '.join(SECTIONS)}, all or none"
+        )
+
+    return [section for section in SECTIONS if section in sections]
+
+
+def get_sections():
+    return parse_sections(config.SECTIONS)
+
+
+def collect_sections(work_item_data, scrapers, cached=None):
+    """
+    Fill the selected sections of work_item_data by calling their scrapers,
+    reusing a cached record when it holds every selected section. Related
+    work is always scraped so links are rebuilt every run.
+    """
+    sections = get_sections()
+
+    if cached and all(section in cached for section in sections):
+        work_item_data["cached"] = True
+        increment("cached_work_items")
+    else:
+        cached = None
+
+    for section in SECTIONS:
+        if section not in sections:
+            increment(f"skipped_{section}")
+        elif cached and section != "related_work":
+            work_item_data[section] = cached[section]
+        else:
+            with span(section):
+                work_item_data[section] = scrapers[section]()
+
+    return work_item_data
+
+
+def project_sections(work_item_data, sections):
+    for section in SECTIONS:
+        if section not in sections:
+            work_item_data.pop(section, None)
+
+    for child in work_item_data.get("children", []):
+        project_sections(child, sections)
+
+    return work_item_data
@@ -0,0 +1,196 @@
+"""
+Encrypted browser session reuse
+
+After a successful login the cookies of every domain, plus the local and
+session storage of the Azure DevOps origin, are saved to SESSION_FILE
+encrypted with a key derived from SESSION_KEY (or the login password).
+Later runs and workers load them into a fresh browser instead of going
+through the Microsoft login again, once a cheap request confirms the cookies
+are still accepted. Requires the optional cryptography package.
+"""
+
+import base64
+import json
+import os
+from urllib.parse import urlparse
+
+import requests
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.wait import WebDriverWait
+
+import config
+from logger import logging
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+except ImportError:
+    Fernet = None
+
+SALT_SIZE = 16
+KDF_ITERATIONS = 480000
+# Fields accepted by Network.setCookies
+COOKIE_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite")
+
+STORAGE_SCRIPT = """
+return {
+    local: Object.assign({}, window.localStorage),
+    session: Object.assign({}, window.sessionStorage),
+};
+"""
+
+# Runs before the page scripts, only on the first load of the origin in a tab
+RESTORE_STORAGE_SCRIPT = """
+if (location.origin === %s && !sessionStorage.getItem("scraperRestored")) {
+    const storage = %s;
+    for (const [key, value] of Object.entries(storage.local)) {
+        localStorage.setItem(key, value);
+    }
+    for (const [key, value] of Object.entries(storage.session)) {
+        sessionStorage.setItem(key, value);
+    }
+    sessionStorage.setItem("scraperRestored", "1");
+}
+"""
+
+
+def get_secret():
+    return config.SESSION_KEY or config.PASSWORD
+
+
+def is_enabled():
+    if not config.SESSION_FILE or not get_secret():
+        return False
+
+    if Fernet is None:
+        logging.info("Install the cryptography package to reuse login sessions")
+        return False
+
+    return True
+
+
+def derive_key(salt):
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(), length=32, salt=salt, iterations=KDF_ITERATIONS
+    )
+    return base64.urlsafe_b64encode(kdf.derive(get_secret().encode("utf-8")))
+
+
+def get_origin(url):
+    scheme, domain = urlparse(url)[0:2]
+    return f"{scheme}://{domain}"
+
+
+def get_check_url(url):
+    scheme, domain, url_path = urlparse(url)[0:3]
+    organization = url_path.split("/")[1]
+    return f"{scheme}://{domain}/{organization}/_apis/connectionData"
+
+
+def save_session(driver, url, path=None):
+    path = path or config.SESSION_FILE
+
+    if not is_enabled():
+        return
+
+    origin = get_origin(url)
+
+    # Storage is read from the Azure DevOps page the login redirects back to
+    try:
+        WebDriverWait(driver, config.MAX_WAIT_TIME or 30).until(
+            lambda driver: get_origin(driver.current_url) == origin
+        )
+        storage = driver.execute_script(STORAGE_SCRIPT)
+    except TimeoutException:
+        storage = {"local": {}, "session": {}}
+
+    session = {
+        "cookies": driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"],
+        "storage": storage,
+        "origin": origin,
+    }
+
+    salt = os.urandom(SALT_SIZE)
+    token = Fernet(derive_key(salt)).encrypt(json.dumps(session).encode("utf-8"))
+    temp_path = f"{path}.tmp"
+
+    with open(temp_path, "wb") as file:
+        os.chmod(temp_path, 0o600)
+        file.write(salt + token)
+
+    os.replace(temp_path, path)
+    logging.info(f"Saved login session to {path}")
+
+
+def load_session(path):
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "rb") as file:
+        content = file.read()
+
+    try:
+        key = derive_key(content[:SALT_SIZE])
+        return json.loads(Fernet(key).decrypt(content[SALT_SIZE:]))
+    except (InvalidToken, ValueError):
+        logging.info(f"Unable to decrypt {path}, logging in again")
+        return None
+
+
+def is_session_valid(session, url):
+    http_session = requests.Session()
+
+    for cookie in session["cookies"]:
+        http_session.cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie["domain"],
+            path=cookie["path"],
+        )
+
+    # Expired sessions are redirected or answered with the sign in page
+    try:
+        response = http_session.get(
+            get_check_url(url),
+            allow_redirects=False,
+            timeout=config.MAX_WAIT_TIME or None,
+        )
+    except requests.RequestException as e:
+        logging.info(f"Unable to check saved login session: {e}")
+        return False
+
+    return response.status_code == 200 and "json" in response.headers.get(
+        "Content-Type", ""
+    )
+
+
+def restore_session(driver, url, path=None):
+    path = path or config.SESSION_FILE
+
+    if not is_enabled() or (session := load_session(path)) is None:
+        return False
+
+    if session["origin"] != get_origin(url) or not is_session_valid(session, url):
+        logging.info("Saved login session expired, logging in again")
+        return False
+
+    cookies = [
+        {
+            **{field: cookie[field] for field in COOKIE_FIELDS if field in cookie},
+            **({"expires": cookie["expires"]} if cookie.get("expires", -1) > 0 else {}),
+        }
+        for cookie in session["cookies"]
+    ]
+    driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+    driver.execute_cdp_cmd(
+        "Page.addScriptToEvaluateOnNewDocument",
+        {
+            "source": RESTORE_STORAGE_SCRIPT
+            % (json.dumps(session["origin"]), json.dumps(session["storage"]))
+        },
+    )
+
+    driver.get(url)
+    logging.info(f"Restored login session from {path}")
+    return True
@@ -1,4 +1,5 @@
-import json
+import config
+from jsonl_utils import read_results
 
 
 def analyze_data(data):
@@ -29,9 +30,8 @@ def analyze_data(data):
 
 
 if __name__ == "__main__":
-    save_file = "data/scrape_result.json"
+    save_file = config.RESULT_FILE
 
-    with open(save_file) as f:
-        scrape_result = json.load(f)
-        data_error = analyze_data(scrape_result)
-        print(data_error)
+    scrape_result = list(read_results(save_file))
+    data_error = analyze_data(scrape_result)
+    print(data_error)
@@ -0,0 +1,217 @@
+"""
+Download completion watcher
+
+Watches the Chrome download directories with inotify (polling the directory
+where inotify is not available) and moves every expected attachment into the
+blob store as soon as it finishes downloading, so attachments are routed
+while the scrape is still running. Downloads which never complete are
+reported as stalled or missing with the time spent waiting for them.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+
+import config
+from blob_utils import ingest_blob, save_blob_index
+from logger import logging
+
+POLL_INTERVAL = 0.5
+PARTIAL_SUFFIXES = (".crdownload", ".part", ".tmp")
+EVENT_HEADER = struct.Struct("iIII")
+# inotify masks for a file written in place or renamed into the directory
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+
+expected = {}
+routed = []
+watch_descriptors = {}
+polled_directories = set()
+lock = threading.Lock()
+libc = None
+inotify_fd = None
+watcher = None
+
+
+def init_inotify():
+    global libc, inotify_fd
+
+    if not sys.platform.startswith("linux"):
+        return
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError) as e:
+        logging.info(f"inotify unavailable, polling download directories: {e}")
+        return
+
+    if fd < 0:
+        logging.info("inotify unavailable, polling download directories")
+        return
+
+    inotify_fd = fd
+
+
+def watch_directory(directory):
+    global watcher
+
+    directory = Path(directory)
+    os.makedirs(directory, exist_ok=True)
+
+    with lock:
+        if watcher is None:
+            init_inotify()
+            watcher = threading.Thread(target=watch, daemon=True)
+            watcher.start()
+
+        if directory in watch_descriptors.values() or directory in polled_directories:
+            return
+
+        descriptor = -1
+        if inotify_fd is not None:
+            descriptor = libc.inotify_add_watch(
+                inotify_fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO
+            )
+
+        if descriptor < 0:
+            polled_directories.add(directory)
+        else:
+            watch_descriptors[descriptor] = directory
+
+
+def expect_download(directory, url, file_name):
+    with lock:
+        expected.setdefault(
+            (Path(directory), file_name), {"url": url, "started": time.monotonic()}
+        )
+
+
+def read_events():
+    try:
+        buffer = os.read(inotify_fd, 64 * 1024)
+    except BlockingIOError:
+        return
+
+    offset = 0
+    while offset < len(buffer):
+        descriptor, _, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+        offset += EVENT_HEADER.size
+        name = buffer[offset : offset + length].rstrip(b"\0")
+        offset += length
+
+        if name and descriptor in watch_descriptors:
+            yield watch_descriptors[descriptor], os.fsdecode(name)
+
+
+def scan_directory(directory):
+    with lock:
+        names = [name for path, name in expected if path == directory]
+
+    for name in names:
+        if Path(directory, name).exists():
+            route_download(directory, name)
+
+
+def watch():
+    while True:
+        if inotify_fd is not None:
+            readable, _, _ = select.select([inotify_fd], [], [], POLL_INTERVAL)
+
+            if readable:
+                for directory, name in read_events():
+                    route_download(directory, name)
+        else:
+            time.sleep(POLL_INTERVAL)
+
+        for directory in list(polled_directories):
+            scan_directory(directory)
+
+
+def route_download(directory, name):
+    with lock:
+        item = expected.pop((directory, name), None)
+
+    if item is None:
+        return
+
+    elapsed = time.monotonic() - item["started"]
+
+    try:
+        blob_path = ingest_blob(item["url"], Path(directory, name))
+        save_blob_index()
+    except OSError as e:
+        logging.info(f"Unable to route downloaded {name}: {e}")
+        return
+
+    routed.append(elapsed)
+    logging.info(f"Downloaded {name} in {elapsed:.1f}s, stored as {blob_path.name}")
+
+
+def get_partial_size(directories):
+    size = 0
+
+    for directory in directories:
+        for path in Path(directory).glob("*"):
+            if path.suffix in PARTIAL_SUFFIXES:
+                try:
+                    size += path.stat().st_size
+                except FileNotFoundError:
+                    pass
+
+    return size
+
+
+def get_waiting(directory=None):
+    with lock:
+        return [
+            key for key in expected if directory is None or key[0] == Path(directory)
+        ]
+
+
+def wait_for_routing(directory=None):
+    """
+    Wait until the expected downloads in directory (or all directories) are
+    routed, giving up once no partial download has grown for
+    DOWNLOAD_STALL_TIMEOUT seconds. Returns the file names never routed.
+    """
+    last_size = None
+    last_progress = time.monotonic()
+
+    while waiting := get_waiting(directory):
+        # Catch files which landed before their directory was watched
+        for path in {path for path, _ in waiting}:
+            scan_directory(path)
+
+        size = get_partial_size({path for path, _ in waiting})
+
+        if size != last_size:
+            last_size, last_progress = size, time.monotonic()
+        elif time.monotonic() - last_progress > config.DOWNLOAD_STALL_TIMEOUT:
+            break
+
+        time.sleep(POLL_INTERVAL)
+
+    missing = []
+    for path, name in get_waiting(directory):
+        with lock:
+            item = expected.pop((path, name))
+
+        elapsed = time.monotonic() - item["started"]
+        state = "stalled" if Path(path, f"{name}.crdownload").exists() else "missing"
+        logging.info(f"Download of {name} {state} after {elapsed:.1f}s")
+        missing.append(name)
+
+    if routed:
+        logging.info(
+            f"Routed {len(routed)} downloads, "
+            f"average {sum(routed) / len(routed):.1f}s, slowest {max(routed):.1f}s"
+        )
+
+    return missing